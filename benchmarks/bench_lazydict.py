@@ -0,0 +1,68 @@
+"""
+Compare wrapping a large nested document (such as parsed JSON) in a Dict, which converts every
+nested dict and list up front, with a LazyDict, which converts them as they are accessed, when
+only a few fields are read. With bl installed (pip install -e .):
+
+    $ python benchmarks/bench_lazydict.py [--records 100000] [--reads 3]
+"""
+
+import argparse, time, tracemalloc
+from bl.dict import Dict, LazyDict
+
+
+def make_document(records):
+    return {
+        'meta': {'count': records, 'source': 'benchmark'},
+        'records': [
+            {
+                'id': i,
+                'name': 'record %d' % i,
+                'tags': ['a', 'b', 'c'],
+                'address': {'street': '%d Main St' % i, 'city': 'Springfield', 'geo': [0.0, 0.0]},
+            }
+            for i in range(records)
+        ],
+    }
+
+
+def measure(fn):
+    """return the time and peak memory allocated by fn()"""
+    tracemalloc.start()
+    t = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--reads', type=int, default=3, help='records whose fields are read')
+    args = parser.parse_args()
+
+    doc = make_document(args.records)
+
+    def read(Class):
+        d = Class(**doc)
+        for i in range(args.reads):
+            assert d.records[i].address.city == 'Springfield'
+        return d.meta.count
+
+    print("%d records, %d read" % (args.records, args.reads))
+    results = {}
+    for Class in [Dict, LazyDict]:
+        elapsed, peak = results[Class] = measure(lambda: read(Class))
+        print("%-9s %8.3f s %10.1f MiB" % (Class.__name__, elapsed, peak / 2 ** 20))
+    print(
+        "LazyDict: %.0fx faster, %.0fx less memory"
+        % (
+            results[Dict][0] / results[LazyDict][0],
+            results[Dict][1] / max(results[LazyDict][1], 1),
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Compare the memory and speed of record types (bl.record) with Dicts, for many small objects
+with the same fields. With bl installed (pip install -e .):
+
+    $ python benchmarks/bench_record.py [--count 200000] [--fields 6]
+"""
+
+import argparse, time, tracemalloc
+from bl.dict import Dict
+from bl.record import record_type
+
+
+def measure(fn):
+    """return the time, the memory allocated by fn() (still held by its result), and the result"""
+    tracemalloc.start()
+    t = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed, size, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--fields', type=int, default=6)
+    args = parser.parse_args()
+
+    fields = ['field%d' % i for i in range(args.fields)]
+    Row = record_type('Row', fields)
+    values = [{field: i for field in fields} for i in range(args.count)]
+    makers = [('Dict', lambda v: Dict(**v)), ('record', lambda v: Row(**v))]
+
+    print("%d objects with %d fields" % (args.count, args.fields))
+    print("%-8s %10s %12s %12s" % ('', 'create', 'memory', 'read'))
+    for name, make in makers:
+        create, size, objects = measure(lambda: [make(v) for v in values])
+        t = time.perf_counter()
+        total = sum(o.field0 + o[fields[-1]] for o in objects)
+        read = time.perf_counter() - t
+        assert total == 2 * sum(range(args.count))
+        print(
+            "%-8s %8.3f s %8.1f MiB %10.3f s (%d bytes/object)"
+            % (name, create, size / 2 ** 20, read, size // args.count)
+        )
+
+
+if __name__ == '__main__':
+    main()
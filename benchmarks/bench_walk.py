@@ -0,0 +1,69 @@
+"""
+Compare the serial and parallel directory walks in bl.rglob on a filesystem with simulated 
+per-call latency, as on an NFS or SMB mount. With bl installed (pip install -e .):
+
+    $ python benchmarks/bench_walk.py [--dirs 400] [--files 10] [--latency 0.002] [--workers 4 16]
+"""
+
+import argparse, os, shutil, tempfile, time
+import bl.rglob
+
+
+def make_tree(path, dirs, files, fanout=8):
+    """create a tree with the given number of directories, each holding the given number of files"""
+    paths = [path]
+    for i in range(dirs):
+        dirpath = os.path.join(paths[i // fanout], 'd%04d' % i)
+        os.makedirs(dirpath)
+        paths.append(dirpath)
+        for j in range(files):
+            open(os.path.join(dirpath, 'f%03d.txt' % j), 'w').close()
+
+
+def with_latency(scandir, latency):
+    def slow_scandir(path):
+        time.sleep(latency)
+        return scandir(path)
+
+    return slow_scandir
+
+
+def timed(fn, *args, **kwargs):
+    t = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - t, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--dirs', type=int, default=400)
+    parser.add_argument('--files', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.002, help='seconds per directory listing')
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 16, 64])
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    scandir = os.scandir
+    try:
+        make_tree(path, args.dirs, args.files)
+        os.scandir = with_latency(scandir, args.latency)
+        serial, expected = timed(bl.rglob.rglob, path, '*.txt')
+        print("%d files in %d dirs, %.1f ms latency" % (len(expected), args.dirs, args.latency * 1000))
+        print("serial:                 %7.3f s" % serial)
+        for workers in args.workers:
+            for ordered in [False, True]:
+                elapsed, result = timed(
+                    bl.rglob.rglob, path, '*.txt', workers=workers, ordered=ordered
+                )
+                assert result == expected
+                print(
+                    "workers=%-3d ordered=%-5s %7.3f s (%.1fx)"
+                    % (workers, ordered, elapsed, serial / elapsed)
+                )
+    finally:
+        os.scandir = scandir
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+asyncio wrappers for bl.file.File, bl.text.Text, bl.json.JSON, and bl.rglob, so that file I/O
+doesn't block the event loop. The blocking calls run on an executor (the loop's default one
+unless AsyncFile.EXECUTOR is set), with at most AsyncFile.LIMIT of them in flight at once, so
+that thousands of small file operations can be started without starving the loop:
+
+    text = await AsyncText.load('/data/notes.txt')
+    text.text = text.text.upper()
+    await text.write(atomic=True)
+
+    async for chunk in AsyncFile(File('/data/big.bin')).iter_chunks():
+        ...
+    jpgs = await rglob('/data/assets', '*.jpg')
+"""
+
+import asyncio, functools, itertools, weakref
+import bl.rglob
+from bl.file import File
+from bl.json import JSON
+from bl.text import Text
+
+
+class AsyncFile:
+    """an async wrapper around a File (or a Text, JSON, ...): the File's blocking methods are
+    available as coroutines, and its attributes (fn, text, data...) are read and set through.
+    Use load() to create the File on the executor, since Text and JSON read the file when created.
+    """
+
+    CLASS = File  # the class that load() creates
+    EXECUTOR = None  # a concurrent.futures executor; None = the event loop's default executor
+    LIMIT = 64  # the most blocking calls in flight at once
+    semaphores = weakref.WeakKeyDictionary()  # event loop -> (limit, asyncio.Semaphore)
+
+    def __init__(self, file):
+        self.__dict__['file'] = file
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.file)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.file, name, value)
+
+    @classmethod
+    async def run(C, function, *args, **kwargs):
+        """run function(*args, **kwargs) on the executor, within the concurrency limit"""
+        loop = asyncio.get_running_loop()
+        limit, semaphore = C.semaphores.get(loop, (None, None))
+        if limit != C.LIMIT:
+            semaphore = asyncio.Semaphore(C.LIMIT)
+            C.semaphores[loop] = (C.LIMIT, semaphore)
+        async with semaphore:
+            return await loop.run_in_executor(
+                C.EXECUTOR, functools.partial(function, *args, **kwargs)
+            )
+
+    @classmethod
+    async def load(C, fn=None, **args):
+        """create C.CLASS(fn=fn, **args) on the executor, and return it wrapped"""
+        return C(await C.run(C.CLASS, fn=fn, **args))
+
+    async def read(self, **params):
+        return await self.run(self.file.read, **params)
+
+    async def write(self, **params):
+        return await self.run(self.file.write, **params)
+
+    async def copy(self, new_fn, **params):
+        return self.__class__(await self.run(self.file.copy, new_fn, **params))
+
+    async def hash(self, **params):
+        return await self.run(self.file.hash, **params)
+
+    async def stat(self):
+        return await self.run(self.file.stat)
+
+    async def exists(self):
+        return await self.run(lambda: self.file.exists)
+
+    async def delete(self):
+        return await self.run(self.file.delete)
+
+    async def iter_chunks(self, size=None, mode='rb'):
+        """yield the contents of the file in chunks (default File.CHUNK_SIZE), each chunk being
+        read on the executor
+        """
+        f = await self.run(open, self.fn, mode)
+        try:
+            while True:
+                chunk = await self.run(f.read, size or self.file.CHUNK_SIZE)
+                if len(chunk) == 0:
+                    break
+                yield chunk
+        finally:
+            await self.run(f.close)
+
+
+class AsyncText(AsyncFile):
+    CLASS = Text
+
+
+class AsyncJSON(AsyncFile):
+    CLASS = JSON
+
+
+async def rglob(dirname, pattern, **kwargs):
+    """bl.rglob.rglob() on the executor"""
+    return await AsyncFile.run(bl.rglob.rglob, dirname, pattern, **kwargs)
+
+
+async def irglob(dirname, pattern, batch=256, **kwargs):
+    """yield the paths from bl.rglob.irglob() as they are found, fetching them from the
+    executor in batches of up to `batch` paths
+    """
+    paths = bl.rglob.irglob(dirname, pattern, **kwargs)
+    while True:
+        results = await AsyncFile.run(lambda: list(itertools.islice(paths, batch)))
+        if len(results) == 0:
+            break
+        for path in results:
+            yield path
@@ -1,8 +1,9 @@
 
-import logging, os, re, sys, time, json
+import io, logging, os, re, sys, time, json
 from configparser import ConfigParser, BasicInterpolation, ExtendedInterpolation
 from bl.dict import Dict         # needed for dot-attribute notation
-from bl.rglob import rglob
+from bl.file import File
+from bl.rglob import rglob_many, SKIP_DIRS
 from collections import OrderedDict
 
 LIST_PATTERN = "^\[\s*([^,]*)\s*(,\s*[^,]*)*,?\s*\]$"
@@ -73,12 +74,14 @@ class Config(Dict):
                 else:                                               # default: string
                     self[s][k] = v.strip()
 
-    def write(self, fn=None, sorted=False, wait=0):
+    def write(self, fn=None, sorted=False, wait=0, atomic=False, fsync=False):
         """write the contents of this config to fn or its __filename__.
+        atomic, fsync   : as for bl.file.File.write()
         """
         config = ConfigParser(interpolation=None)
+        keys = list(self.__dict__.get('ordered_keys') or self.keys())
         if sorted==True: keys.sort()
-        for key in self.__dict__.get('ordered_keys') or self.keys():
+        for key in keys:
             config[key] = {}
             ks = self[key].keys()
             if sorted==True: ks.sort()
@@ -98,8 +101,13 @@ class Config(Dict):
         else:
             with open(fn+'.LOCK', 'w') as lf:
                 lf.write(time.strftime("%Y-%m-%d %H:%M:%S %Z"))
-            with open(fn, 'w') as f:
+            if atomic==True or fsync==True:
+                f = io.StringIO()
                 config.write(f)
+                File(fn=fn).write(data=f.getvalue(), mode='w', atomic=atomic, fsync=fsync)
+            else:
+                with open(fn, 'w') as f:
+                    config.write(f)
             os.remove(fn+'.LOCK')
 
 class ConfigTemplate(Config):
@@ -132,7 +140,7 @@ class ConfigTemplate(Config):
         expected_keys = self.expected_param_keys()
         compiled_params = Dict(**params)
         for key in expected_keys:
-            if key not in compiled_params.keys():
+            if key not in compiled_params:
                 if prompt==True:
                     if key=='password':
                         compiled_params[key] = getpass("%s: " % key)
@@ -154,13 +162,15 @@ class ConfigTemplate(Config):
 def package_config(path, template='__config__.ini.TEMPLATE', config_name='__config__.ini', **params):
     """configure the module at the given path with a config template and file.
         path        = the filesystem path to the given module
-        template    = the config template filename within that path
+        template    = the config template filename within that path, or a list of filenames, 
+                        all of which are found in a single pass through the directory tree
         config_name = the config filename within that path
         params      = a dict containing config params, which are found in the template using %(key)s.
     """
     config_fns = []
-    template_fns = rglob(path, template)
-    for template_fn in template_fns:
+    templates = [template] if isinstance(template, str) else template
+    template_fns = rglob_many(path, templates, prune=SKIP_DIRS)
+    for template_fn in [fn for t in templates for fn in template_fns[t]]:
         config_template = ConfigTemplate(fn=template_fn)
         config = config_template.render(
             fn=os.path.join(os.path.dirname(template_fn), config_name), 
@@ -1,30 +1,440 @@
 
-
 import logging
 log = logging.getLogger(__name__)
 
-import csv
-from bl.text import Text
-from collections import OrderedDict
+import csv, datetime, gzip, io, math, os, zipfile
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from bl.file import File
+
+try:
+    import numpy
+except ImportError:     # optional, for load_columns()
+    numpy = None
+
+CHUNK_SIZE = 16 * 1024 * 1024     # the size of the byte ranges that are parsed in parallel
+
+def load_csv(fn, encoding='UTF-8', delimiter='\t', headings=True, **params):
+    """load the delimited file at fn into a list of rows; parameters as for iter_csv()"""
+    return list(iter_csv(fn, encoding=encoding, delimiter=delimiter, headings=headings, **params))
+
+def iter_csv(
+    fn, encoding='UTF-8', delimiter='\t', headings=True, records=False, 
+    workers=None, ordered=True, chunk_size=CHUNK_SIZE
+):
+    """yield the rows of the delimited file at fn as OrderedDicts, streaming from the file, so that 
+    memory use doesn't depend on the size of the file. Quoted fields can contain newlines. 
+    Blank lines are skipped.
+        encoding='UTF-8'    = the encoding of the file
+        delimiter='\\t'      = the field delimiter
+        headings=True       = if True, the first row is the keys; otherwise the keys are the 
+                                spreadsheet column letters (A, B, ... Z, AA, ...), as they are 
+                                for any cells beyond the headings
+        records=False       = if True, yield compact Records (see record_class()) rather than 
+                                OrderedDicts, so that the keys are stored once, not in every row
+        workers=None        = if given, parse the file in this many processes: it is split into 
+                                byte ranges of about chunk_size that end at record boundaries 
+                                (see csv_ranges()), which are parsed in parallel. The encoding
+                                must be ASCII-compatible (such as UTF-8 or Latin-1).
+        ordered=True        = with workers, whether to yield the rows in file order; if False,
+                                each range's rows are yielded as soon as it has been parsed
+        chunk_size          = with workers, the approximate size of the byte ranges
+    """
+    if workers is not None:
+        yield from iter_csv_parallel(
+            fn, encoding=encoding, delimiter=delimiter, headings=headings, records=records,
+            workers=workers, ordered=ordered, chunk_size=chunk_size
+        )
+        return
+    with open(fn, 'r', encoding=encoding, newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        keys = []
+        if headings==True:
+            keys = next(reader, [])
+        yield from make_rows(reader, keys, records=records)
+
+def make_rows(rows, keys, records=False, classes=None):
+    """yield an OrderedDict (or Record) for each list of values in rows, skipping blank rows, 
+    and extending the keys with the column letters as needed. classes = a dict of keys -> Record 
+    class, to share the Record classes between calls (so that the rows of a file that is parsed 
+    in parts have the same class for the same keys)
+    """
+    keys = list(keys)
+    Record = None
+    if classes is None:
+        classes = {}
+    for row in rows:
+        if len(row)==0:
+            continue
+        if len(keys) < len(row):
+            while len(keys) < len(row):
+                keys.append(excel_key(len(keys)))
+            Record = None
+        if records==True:
+            if Record is None:
+                if tuple(keys) not in classes:
+                    classes[tuple(keys)] = record_class(keys)
+                Record = classes[tuple(keys)]
+            yield Record(row)
+        else:
+            yield OrderedDict(zip(keys, row))
 
-def load_csv(fn, encoding='UTF-8', delimiter='\t', headings=True):
-    data = []
-    t = Text(fn=fn, encoding=encoding)
-    lines = t.text.split("\n")
-    reader = csv.reader(lines, delimiter=delimiter)
+def iter_csv_parallel(
+    fn, encoding='UTF-8', delimiter='\t', headings=True, records=False, 
+    workers=4, ordered=True, chunk_size=CHUNK_SIZE
+):
+    """the parallel mode of iter_csv(): parse byte ranges of the file in a pool of processes, 
+    with up to 2 ranges per process in progress (or parsed and waiting to be yielded) at a time
+    """
+    keys, start = [], 0
     if headings==True:
-        # the first row is the keys
-        keys = reader.__next__()
-    else:
-        # the first row is data, keys are letters
-        row = reader.__next__()
-        keys = [excel_key(i) for i in range(len(row))]
-        d = OrderedDict(**{keys[i]:row[i] for i in range(len(row))})
-        data.append(d)
-    for row in reader:
-        d = OrderedDict(**{keys[i]:row[i] for i in range(len(row))})
-        data.append(d)
-    return data
+        with File(fn=fn).mmap() as data:
+            start = next_record(data, 0, 0)
+            text = bytes(data[:start]).decode(encoding)
+        keys = next(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter), [])
+    ranges = csv_ranges(fn, chunk_size=chunk_size, start=start)
+    # Records are made here, since their classes can't be pickled; OrderedDicts in the workers
+    row_keys = None if records==True else keys
+    classes = {}
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for i in range(len(ranges) + 1):
+                if i < len(ranges):
+                    pending.append(
+                        pool.submit(parse_csv_range, fn, *ranges[i], encoding, delimiter, row_keys)
+                    )
+                    if len(pending) < 2 * workers:
+                        continue
+                while len(pending) > 0 and (len(pending) >= 2 * workers or i == len(ranges)):
+                    if ordered==True:
+                        future = pending.popleft()
+                    else:
+                        future = next(iter(wait(pending, return_when=FIRST_COMPLETED).done))
+                        pending.remove(future)
+                    if records==True:
+                        yield from make_rows(
+                            future.result(), keys, records=True, classes=classes
+                        )
+                    else:
+                        yield from future.result()
+        finally:
+            for future in pending:      # if the iteration is stopped early
+                future.cancel()
+
+def parse_csv_range(fn, start, end, encoding, delimiter, keys=None):
+    """parse the byte range [start:end] of the file at fn, which must begin and end at record 
+    boundaries, returning a list of OrderedDicts with the given keys (see make_rows()), or the 
+    lists of values if keys is None
+    """
+    with open(fn, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    reader = csv.reader(io.StringIO(text, newline=''), delimiter=delimiter)
+    if keys is None:
+        return list(reader)
+    return list(make_rows(reader, keys))
+
+def csv_ranges(fn, chunk_size=CHUNK_SIZE, start=0, quotechar='"'):
+    """split the delimited file at fn, from the start offset (a record boundary) to the end, into 
+    a list of (start, end) byte ranges of about chunk_size that begin and end at record boundaries.
+    A boundary is a newline that isn't inside a quoted field, found by counting the quote 
+    characters from the start, so quote characters are assumed to occur only within quoted 
+    fields (which is how the csv module writes them), and the encoding must be ASCII-compatible.
+    """
+    ranges = []
+    with File(fn=fn).mmap() as data:
+        while start < len(data):
+            end = next_record(data, start, start + chunk_size, quotechar=quotechar)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def next_record(data, start, pos, quotechar='"'):
+    """return the offset of the first record boundary in the data at or after pos, given that 
+    start is a record boundary (at most len(data)); see csv_ranges()
+    """
+    quote = quotechar.encode('ascii')
+    if pos >= len(data):
+        return len(data)
+    inside = bytes(data[start:pos]).count(quote) % 2 == 1
+    while True:
+        newline = data.find(b'\n', pos)
+        if newline == -1:
+            return len(data)
+        inside = inside != (bytes(data[pos:newline]).count(quote) % 2 == 1)
+        if not inside:
+            return newline + 1
+        pos = newline + 1
+
+class Record(tuple):
+    """a row of values that shares its keys with the other rows from the same file. A Record is
+    a tuple, so it has no per-row dict, but it can also be used like a read-only OrderedDict 
+    (row['key'], row.get('key'), keys(), items(), ...) and by attribute (row.key, for keys 
+    that are identifiers and not tuple methods), and compares equal to a dict with the same items. The keys of a 
+    short row are the first len(row) keys; the attribute of a missing key is None.
+    """
+    __slots__ = ()
+    KEYS = ()
+    INDEX = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            i = self.INDEX.get(key)
+            if i is None or i >= len(self):
+                raise KeyError(key)
+            key = i
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        i = self.INDEX.get(name)
+        if i is None:
+            raise AttributeError(name)
+        if i < len(self):
+            return tuple.__getitem__(self, i)
+
+    def __contains__(self, key):
+        i = self.INDEX.get(key)
+        return i is not None and i < len(self)
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return other == dict(self.items())
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = tuple.__hash__
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            self.__class__.__name__, ', '.join("%s=%r" % item for item in self.items())
+        )
+
+    def get(self, key, default=None):
+        i = self.INDEX.get(key)
+        return tuple.__getitem__(self, i) if i is not None and i < len(self) else default
+
+    def keys(self):
+        return list(self.KEYS[:len(self)])
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        return list(zip(self.KEYS, self))
+
+    def as_dict(self):
+        return OrderedDict(self.items())
+
+def record_class(keys, name='Record'):
+    """create a Record subclass for rows with the given keys"""
+    keys = tuple(keys)
+    return type(name, (Record,), {
+        '__slots__': (), 'KEYS': keys, 'INDEX': {key: i for i, key in enumerate(keys)}
+    })
+
+def load_columns(
+    fn, encoding='UTF-8', delimiter='\t', headings=True, types=None, sample=1000, use_numpy=None
+):
+    """load the delimited file at fn into typed columns: an OrderedDict of key -> column. Integer 
+    and float columns are packed into array.array('q') and array.array('d') (or NumPy arrays), 
+    date (YYYY-MM-DD) columns are lists of datetime.date (or NumPy datetime64[D] arrays), and 
+    other columns are lists of str. Blank cells are NaN in float columns and None in date and 
+    text columns; an integer column with blanks is loaded as float.
+        encoding, delimiter, headings = as for iter_csv()
+        types=None      = a dict of key -> int, float, datetime.date, or str, for the columns 
+                            whose type should not be inferred
+        sample=1000     = the number of rows from which the other columns' types are inferred;
+                            a later value that doesn't fit its column's type raises ValueError
+        use_numpy=None  = whether to make NumPy arrays; by default, if NumPy is installed
+    """
+    types = dict(types or {})
+    rows = iter_csv(fn, encoding=encoding, delimiter=delimiter, headings=headings, records=True)
+    first = []
+    for row in rows:
+        first.append(row)
+        if len(first) >= sample:
+            break
+    keys = list(first[-1].KEYS) if len(first) > 0 else []
+    for key in keys:
+        if key not in types:
+            types[key] = infer_type(row.get(key, '') for row in first)
+    columns = OrderedDict(
+        (key, array('q') if types[key] == int else array('d') if types[key] == float else [])
+        for key in keys
+    )
+    converters = {key: CONVERTERS[types[key]] for key in keys}
+
+    def add(row):
+        for key in row.KEYS[len(columns):]:     # cells beyond the columns so far
+            types[key] = str
+            converters[key] = CONVERTERS[str]
+            columns[key] = [None] * len(columns[keys[0]])
+            keys.append(key)
+        for key in keys:
+            value = row.get(key, '')
+            try:
+                columns[key].append(converters[key](value))
+            except (ValueError, TypeError):
+                raise ValueError(
+                    "%r in column %r is not %s (give its type in types)" 
+                    % (value, key, types[key].__name__)
+                )
+
+    for row in first:
+        add(row)
+    for row in rows:
+        add(row)
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    if use_numpy == True:
+        for key in keys:
+            if types[key] == int:
+                columns[key] = numpy.frombuffer(columns[key], dtype=numpy.int64).copy()
+            elif types[key] == float:
+                columns[key] = numpy.frombuffer(columns[key], dtype=numpy.float64).copy()
+            elif types[key] == datetime.date:
+                columns[key] = numpy.array(columns[key], dtype='datetime64[D]')
+    return columns
+
+def infer_type(values):
+    """the narrowest of int, float, datetime.date, and str that fits all the (str) values; int 
+    values with blanks are float. Words that float() accepts, such as 'nan' and 'inf', are not 
+    taken to be floats (give the column's type to load them as floats).
+    """
+    candidates = [int, float, datetime.date]
+    blanks = False
+    for value in values:
+        if value.strip() == '':
+            blanks = True
+            continue
+        for t in list(candidates):
+            try:
+                if t == float and not math.isfinite(to_float(value)):
+                    raise ValueError(value)
+                CONVERTERS[t](value)
+            except ValueError:
+                candidates.remove(t)
+        if len(candidates) == 0:
+            return str
+    if len(candidates) == 3:
+        return str      # all blank
+    if blanks == True and candidates[0] == int:
+        return float
+    return candidates[0]
+
+def to_int(value):
+    return int(value)
+
+def to_float(value):
+    return float(value) if value.strip() != '' else float('nan')
+
+def to_date(value):
+    if value.strip() == '':
+        return None
+    return datetime.datetime.strptime(value.strip(), '%Y-%m-%d').date()
+
+def to_str(value):
+    return value if value != '' else None
+
+CONVERTERS = {int: to_int, float: to_float, datetime.date: to_date, str: to_str}
+
+class CSVWriter:
+    """write rows to a delimited file as they come, in constant memory, with large buffered writes:
+
+        with CSVWriter('/data/export.tsv.gz') as writer:
+            for row in rows:
+                writer.write(row)
+
+    The rows can be dicts, Records, or lists of values (in the order of the keys). 
+        fn                  = the file to write; if it ends with .gz or .zip, it is compressed 
+                                (as a zip archive containing one file, named fn without .zip)
+        keys=None           = the keys of the columns; by default, the keys of the first row,
+                                or for a list, excel_key() names for its columns: A, B, C...
+        encoding='UTF-8'    = the encoding of the file
+        delimiter='\t'      = the field delimiter
+        headings=True       = whether to write the keys as the first row (if False, the rows can 
+                                be read back with load_csv(headings=False))
+        compression=None    = 'gzip', 'zip', or False, to override the choice by extension
+        buffer_size         = the size of the write buffer, in bytes
+    """
+
+    def __init__(
+        self, fn, keys=None, encoding='UTF-8', delimiter='\t', headings=True, compression=None, 
+        buffer_size=File.CHUNK_SIZE
+    ):
+        self.fn = str(fn)
+        self.keys = list(keys) if keys is not None else None
+        self.headings = headings
+        self.count = 0  # the number of rows written, not counting the headings
+        self.started = False
+        if compression is None:
+            compression = {'.gz': 'gzip', '.zip': 'zip'}.get(os.path.splitext(self.fn)[-1].lower())
+        self.archive = None
+        if compression == 'zip':
+            self.archive = zipfile.ZipFile(self.fn, 'w', compression=zipfile.ZIP_DEFLATED)
+            name = os.path.basename(os.path.splitext(self.fn)[0])
+            raw = self.archive.open(name, 'w', force_zip64=True)
+        elif compression == 'gzip':
+            raw = gzip.open(self.fn, 'wb')
+        else:
+            raw = open(self.fn, 'wb', buffering=0)
+        self.file = io.TextIOWrapper(
+            io.BufferedWriter(raw, buffer_size=buffer_size), encoding=encoding, newline=''
+        )
+        self.writer = csv.writer(self.file, delimiter=delimiter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, row):
+        """write the row: a dict, Record, or list of values"""
+        if self.keys is None:
+            if hasattr(row, 'keys'):
+                self.keys = list(row.keys())
+            else:
+                self.keys = [excel_key(i) for i in range(len(row))]
+        self.start()
+        if hasattr(row, 'keys'):
+            extra = [key for key in row.keys() if key not in self.keys]
+            if len(extra) > 0:
+                raise ValueError("row has keys that are not in the columns: %r" % extra)
+            row = [row.get(key) for key in self.keys]
+        self.writer.writerow(row)
+        self.count += 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def start(self):
+        """write the headings, if they haven't been written"""
+        if self.started==False:
+            if self.headings==True and self.keys:
+                self.writer.writerow(self.keys)
+            self.started = True
+
+    def close(self):
+        if self.file is not None:
+            self.start()
+            self.file.close()
+            self.file = None
+            if self.archive is not None:
+                self.archive.close()
+
+def dump_csv(fn, rows, **params):
+    """write the rows (an iterable of dicts, Records, or lists) to the delimited file at fn, 
+    streaming; params as for CSVWriter. Returns the number of rows written.
+    """
+    with CSVWriter(fn, **params) as writer:
+        writer.write_rows(rows)
+    return writer.count
 
 def excel_key(index):
     """create a key for index by converting index into a base-26 number, using A-Z as the characters."""
@@ -1,5 +1,5 @@
 # definition of a dict-replacement class that allows dot-notation attribute access
-import collections
+import bisect, collections, functools, re
 
 
 class Dict(dict):
@@ -8,6 +8,8 @@ class Dict(dict):
     * sorts keys on calls to keys() and items() and repr(), making many things easier
     * therefore requires that all keys need to be a sortable collection -- 
         for example only use string keys.
+    * keeps the sorted keys, updating them as keys are added and removed, so that repeated
+        calls to keys() and values() don't sort the keys again.
     * allows calling itself with parameters, which creates a new Dict based on 
         this one without modifying it. (immutability)
 
@@ -56,7 +58,7 @@ class Dict(dict):
                 if type(i) == dict:
                     l.append(Dict(**i))
                 elif type(i) == list:
-                    l.append(make_list(i))
+                    l.append(dict_list_val(i))
                 elif type(i) == bytes:
                     l.append(i.decode('UTF-8'))
                 else:
@@ -81,13 +83,79 @@ class Dict(dict):
     def __repr__(self):
         """displays the Dict with keys in alphabetical order, for consistent test output."""
         keys = self.keys()
-        keys.sort()
         return "{" + ", ".join(["%s: %s" % (repr(k), repr(self[k])) for k in keys]) + "}"
 
+    # The sorted keys are kept in self.__dict__['__keys__'] and updated by the methods that add 
+    # or remove keys, so subclasses must add and remove keys through them (or uncache_key()), 
+    # not dict.__setitem__ etc. If the length differs anyway, the keys are sorted again.
+
+    def sorted_keys(self):
+        """the (cached) list of sorted keys -- not to be modified"""
+        ks = self.__dict__.get('__keys__')
+        if ks is None or len(ks) != dict.__len__(self):
+            ks = self.__dict__['__keys__'] = sorted(dict.keys(self))
+        return ks
+
+    def __setitem__(self, key, val):
+        ks = self.__dict__.get('__keys__')
+        if ks is not None and not dict.__contains__(self, key):
+            bisect.insort(ks, key)
+        dict.__setitem__(self, key, val)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.uncache_key(key)
+
+    def uncache_key(self, key):
+        ks = self.__dict__.get('__keys__')
+        if ks is not None:
+            i = bisect.bisect_left(ks, key)
+            if i < len(ks) and ks[i] == key:
+                del ks[i]
+            else:
+                self.__dict__['__keys__'] = None
+
+    def pop(self, key, *default):
+        if dict.__contains__(self, key):
+            val = dict.pop(self, key)
+            self.uncache_key(key)
+            return val
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, val = dict.popitem(self)
+        self.uncache_key(key)
+        return key, val
+
+    def setdefault(self, key, default=None):
+        if not dict.__contains__(self, key):
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def clear(self):
+        dict.clear(self)
+        self.__dict__['__keys__'] = None
+
+    def __ior__(self, other):
+        dict.__ior__(self, other)
+        self.__dict__['__keys__'] = None
+        return self
+
+    def __getstate__(self):
+        # don't pickle or copy the sorted keys, so that copies don't share them
+        return {k: v for k, v in self.__dict__.items() if k != '__keys__'} or None
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
     def keys(self, key=None, reverse=False):
         """sort the keys before returning them"""
-        ks = sorted(list(dict.keys(self)), key=key, reverse=reverse)
-        return ks
+        if key is not None:
+            return sorted(dict.keys(self), key=key, reverse=reverse)
+        elif reverse == True:
+            return self.sorted_keys()[::-1]
+        else:
+            return list(self.sorted_keys())
 
     def values(self, key=None, reverse=False):
         """sort the values in the same order as the keys"""
@@ -99,6 +167,99 @@ class Dict(dict):
         return _json.dumps(self, **params)
 
 
+class LazyDict(Dict):
+    """A Dict that converts its nested dicts and lists when they are first accessed, rather than
+    all at once in update(), and keeps the converted values. Wrapping a large document, such as
+    parsed JSON, then costs in proportion to what is read, not to the size of the document:
+
+    >>> d = LazyDict(**{'a': {'b': [{'c': 1}, 2]}, 'x': {'y': 0}})
+    >>> d.a.b[0].c                                  # only a, a.b, and a.b[0] are converted
+    1
+    >>> type(dict.__getitem__(d, 'x')).__name__     # x has not been converted
+    'dict'
+    """
+
+    def update(xCqNck7t, **kwargs):
+        """Updates the LazyDict with the given values, which are converted when accessed."""
+        for k in kwargs:
+            Dict.__setitem__(xCqNck7t, k, kwargs[k])
+
+    def __getitem__(self, key):
+        return lazy_item(self, key, dict.__getitem__(self, key))
+
+    def __getattr__(self, name):
+        if name in self:
+            return self[name]
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        return [(k, self[k]) for k in dict.keys(self)]
+
+    def __eq__(self, other):
+        """compare the converted values, so that a LazyDict equals the Dict of the same document"""
+        if not isinstance(other, dict):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            k in other and self[k] == other[k] for k in dict.keys(self)
+        )
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            Dict.__delitem__(self, key)
+            return value
+        return dict.pop(self, key, *default)
+
+
+class LazyList(list):
+    """A list whose nested dicts and lists are converted (to LazyDicts and LazyLists) when they
+    are first accessed; bytes are decoded as UTF-8, as in Dict.update()."""
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyList(list.__getitem__(self, index))
+        return lazy_item(self, index, list.__getitem__(self, index))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        """compare the converted values (see LazyDict.__eq__)"""
+        if not isinstance(other, list):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def pop(self, index=-1):
+        value = self[index]
+        list.pop(self, index)
+        return value
+
+
+def lazy_item(container, key, value):
+    """convert the value at container[key] for a LazyDict or LazyList, if needed, and cache it"""
+    if type(value) == dict:
+        value = LazyDict(**value)
+    elif type(value) == list:
+        value = LazyList(value)
+    elif type(value) == bytes and type(container) == LazyList:
+        value = value.decode('UTF-8')
+    else:
+        return value
+    (dict if isinstance(container, dict) else list).__setitem__(container, key, value)
+    return value
+
+
 class OrderedDict(collections.OrderedDict, Dict):
     """OrderedDict with dot-attribute access"""
 
@@ -115,6 +276,62 @@ class StringDict(Dict):
         return Dict.get(self, name) or ""
 
 
+PATH_STEP = re.compile(r"""\.?([^.\[\]'"]+)|\[(-?\d+)\]|\[(['"])(.*?)\3\]""")
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_path(path):
+    """parse a path such as 'a.b[0].c' or 'a["b.c"][-1]' into its steps: ('a', 'b', 0, 'c')"""
+    steps = []
+    pos = 0
+    while pos < len(path):
+        md = PATH_STEP.match(path, pos)
+        if md is None or (pos > 0 and md.group(1) is not None and path[pos] != '.'):
+            raise ValueError("invalid path: %r" % path)
+        name, index, quote, key = md.groups()
+        steps.append(name if name is not None else int(index) if index is not None else key)
+        pos = md.end()
+    return tuple(steps)
+
+
+def getter(path, default=None):
+    """compile the path (see parse_path()) into a function that gets the value at that path in
+    nested dicts, lists, Dicts, etc., or the default if any step is missing (in a NoDict,
+    a missing step is No, as usual):
+
+    >>> get_city = getter('addresses[0].city')
+    >>> get_city(Dict(addresses=[{'city': 'Springfield'}])), get_city(Dict())
+    ('Springfield', None)
+    """
+    steps = parse_path(path)
+
+    def get(obj):
+        try:
+            for step in steps:
+                obj = obj[step]
+            return obj
+        except (KeyError, IndexError, TypeError):
+            return default
+
+    return get
+
+
+def pluck(records, *paths, default=None):
+    """return a list of columns, one per path, of the values at those paths in the records,
+    in one pass through the records:
+
+    >>> pluck([Dict(a=Dict(b=1), c=2), Dict(c=3)], 'a.b', 'c')
+    [[1, None], [2, 3]]
+    """
+    getters = [getter(path, default=default) for path in paths]
+    columns = [[] for path in paths]
+    appends = [column.append for column in columns]
+    for record in records:
+        for append, get in zip(appends, getters):
+            append(get(record))
+    return columns
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
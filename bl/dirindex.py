@@ -0,0 +1,242 @@
+"""
+A DirIndex is a snapshot of a directory tree -- the name, type, size, mtime, inode, and allocated
+blocks of every file and directory -- that is stored on disk in a compact (gzipped JSON) form. Rescanning only
+lists the directories whose mtime has changed since the last scan, and reports the changes, and
+rglob-style queries are answered from the snapshot without touching the filesystem:
+
+    index = DirIndex(fn='/var/cache/assets.index', root='/data/assets')
+    changes = index.scan()          # Dict(added=[...], removed=[...], modified=[...])
+    index.write()                   # store the snapshot at index.fn
+    index.rglob('*.jpg')            # sorted list of matching paths, like bl.rglob.rglob()
+    Folder('/data/assets/2019').rglob('*.jpg', index=index)
+"""
+
+import gzip, json, logging, os, stat, sys
+from collections import namedtuple
+from bl.dict import Dict
+from bl.file import File
+from bl.rglob import compile_names, compile_path_pattern, compile_segments, scandir
+
+log = logging.getLogger(__name__)
+
+Entry = namedtuple('Entry', ['name', 'type', 'size', 'mtime', 'ino', 'blocks'])
+Entry.__doc__ = """an entry in a DirIndex directory: type is FILE or DIR, mtime is in nanoseconds,
+blocks is the number of 512-byte blocks allocated (None if the system doesn't say)"""
+
+FILE = 'f'
+DIR = 'd'
+
+
+class DirIndex(File):
+    """a persistent snapshot of the directory tree at root, stored in the file at fn.
+    self.dirs holds {reldir: (mtime, ino, [Entry, ...])} for each directory in the tree,
+    with reldir relative to the root ('' for the root itself).
+    """
+
+    VERSION = 2
+
+    def __init__(self, fn=None, root=None, **args):
+        File.__init__(self, fn=fn, root=root and self.normpath(str(root)), **args)
+        self.dirs = {}
+        if self.fn is not None and os.path.exists(self.fn):
+            self.load()
+
+    def __repr__(self):
+        return "%s(fn=%r, root=%r)" % (self.__class__.__name__, self.fn, self.root)
+
+    def load(self, fn=None):
+        """load the stored snapshot from fn or self.fn"""
+        with gzip.open(fn or self.fn, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != self.VERSION:
+            log.warning("ignoring index with version %r: %s" % (data.get('version'), fn or self.fn))
+        elif self.root not in [None, data['root']]:
+            log.warning("ignoring index of %r: %s" % (data['root'], fn or self.fn))
+        else:
+            self.root = data['root']
+            self.dirs = {
+                reldir: (mtime, ino, [Entry(*e) for e in entries])
+                for reldir, (mtime, ino, entries) in data['dirs'].items()
+            }
+
+    def write(self, fn=None, **args):
+        """store the snapshot at fn or self.fn"""
+        data = {'version': self.VERSION, 'root': self.root, 'dirs': self.dirs}
+        File.write(
+            self,
+            fn=fn,
+            data=gzip.compress(json.dumps(data, separators=(',', ':')).encode('utf-8')),
+            **args
+        )
+
+    def scan(self, check_files=True, prune=None):
+        """scan the directory tree, listing only the directories that are new or have changed
+        since the last scan, and return a Dict of the lists of relative paths that were added,
+        removed, and modified. Symlinks are indexed as files (with the size of the link), not 
+        followed. A directory that can't be listed keeps its previous entries, and is listed again
+        on the next scan.
+            check_files=True    = whether to stat the files in unchanged directories, in order to
+                                    find modified files. (Adding, removing, or renaming a file
+                                    changes the mtime of its directory; modifying it does not.)
+            prune=None          = names (glob patterns or compiled regexes) of directories to skip
+        """
+        changes = Dict(added=[], removed=[], modified=[])
+        pruned = compile_names(prune)
+        old_dirs, dirs = self.dirs, {}  # self.dirs is replaced only when the scan is complete
+        st = os.stat(self.root)
+        stack = [('', st.st_mtime_ns, st.st_ino)]
+        while len(stack) > 0:
+            reldir, mtime, ino = stack.pop()
+            dirpath = os.path.join(self.root, reldir)
+            old = old_dirs.get(reldir)
+            try:
+                if old is not None and old[:2] == (mtime, ino):
+                    entries = self.restat(dirpath, old[2], check_files=check_files)
+                else:
+                    entries = self.list(dirpath, pruned=pruned)
+            except OSError:
+                log.warning("could not list %r: %s" % (dirpath, sys.exc_info()[1]))
+                mtime, entries = None, old and old[2] or []  # None: list it next time
+            self.compare(old_dirs, reldir, old and old[2] or [], entries, changes)
+            dirs[reldir] = (mtime, ino, entries)
+            stack += [
+                (os.path.join(reldir, e.name), e.mtime, e.ino) for e in entries if e.type == DIR
+            ]
+        self.dirs = dirs
+        return changes
+
+    @classmethod
+    def list(C, dirpath, pruned=None):
+        """list the entries in the given directory (symlinks are not followed)"""
+        entries = []
+        for entry in scandir(dirpath, pruned=pruned, follow_symlinks=False):
+            try:
+                entries.append(C.make_entry(entry.name, entry.stat(follow_symlinks=False)))
+            except OSError:
+                log.debug("could not stat %r" % entry.path)  # removed
+        return entries
+
+    @classmethod
+    def restat(C, dirpath, entries, check_files=True):
+        """return the entries of an unchanged directory with the current stat of each directory
+        (and file, if check_files), so that changes below this directory can be found.
+        """
+        current = []
+        for e in entries:
+            if e.type == DIR or check_files == True:
+                try:
+                    e = C.make_entry(e.name, os.lstat(os.path.join(dirpath, e.name)))
+                except OSError:
+                    continue
+            current.append(e)
+        return current
+
+    @classmethod
+    def make_entry(C, name, st):
+        if stat.S_ISDIR(st.st_mode):
+            return Entry(name, DIR, 0, st.st_mtime_ns, st.st_ino, 0)
+        else:
+            blocks = getattr(st, 'st_blocks', None)
+            return Entry(name, FILE, st.st_size, st.st_mtime_ns, st.st_ino, blocks)
+
+    def compare(self, old_dirs, reldir, old_entries, entries, changes):
+        """record the changes between the old and new entries of the given directory"""
+        old_entries = {e.name: e for e in old_entries}
+        for e in entries:
+            relpath = os.path.join(reldir, e.name)
+            old = old_entries.pop(e.name, None)
+            if old is None:
+                changes.added.append(relpath)
+            elif old.type != e.type:
+                changes.removed += [relpath] + self.subtree(old_dirs, relpath, old)
+                changes.added.append(relpath)
+            elif e.type == FILE and (e.size, e.mtime, e.ino) != (old.size, old.mtime, old.ino):
+                changes.modified.append(relpath)
+        for name, old in old_entries.items():
+            relpath = os.path.join(reldir, name)
+            changes.removed += [relpath] + self.subtree(old_dirs, relpath, old)
+
+    @classmethod
+    def subtree(C, dirs, reldir, entry):
+        """the relative paths of all entries below the given directory entry in dirs"""
+        relpaths = []
+        if entry.type == DIR and reldir in dirs:
+            for e in dirs[reldir][2]:
+                relpath = os.path.join(reldir, e.name)
+                relpaths += [relpath] + C.subtree(dirs, relpath, e)
+        return relpaths
+
+    def ientries(
+        self, path=None, exclude=None, prune=None, depth=None, 
+        workers=None, ordered=False, follow_symlinks=True, stat=False
+    ):
+        """yield (path, Entry) for each entry in the index, optionally only those below path.
+            exclude = names (glob patterns or compiled regexes) of entries to omit
+            prune   = names (glob patterns or compiled regexes) of directories to skip
+            depth   = if given, the number of levels below path to include
+        The other options of bl.rglob.walk() (workers, ordered, follow_symlinks, stat) are 
+        accepted, so that the same arguments work with or without an index, and ignored.
+        """
+        excluded = compile_names(exclude)
+        pruned = compile_names(prune)
+        reldir = self.reldir(path)
+        stack = [(reldir, 1)] if reldir in self.dirs else []
+        while len(stack) > 0:
+            reldir, level = stack.pop()
+            dirpath = os.path.join(self.root, reldir)
+            for e in self.dirs[reldir][2]:
+                if e.type == DIR:
+                    if pruned is not None and pruned(e.name):
+                        continue
+                    if depth is None or level < depth:
+                        stack.append((os.path.join(reldir, e.name), level + 1))
+                if excluded is None or not excluded(e.name):
+                    yield os.path.join(dirpath, e.name), e
+
+    def iglob(self, pattern, path=None):
+        """yield (path, Entry) for each entry in the index that matches the pattern relative to 
+        path (default the index root), like glob.iglob(os.path.join(path, pattern)).
+        """
+        parts = compile_segments(pattern)
+        reldirs = [self.reldir(path)]
+        for i, part in enumerate(parts):
+            matches = [
+                (os.path.join(reldir, e.name), e)
+                for reldir in reldirs
+                if reldir in self.dirs
+                for e in self.dirs[reldir][2]
+                if part(e.name)
+            ]
+            reldirs = [relpath for relpath, e in matches if e.type == DIR]
+        for relpath, e in matches:
+            yield os.path.join(self.root, relpath), e
+
+    def irglob(self, pattern, dirs=False, path=None, **kwargs):
+        """yield (path, Entry) for each entry in the index that matches the pattern.
+        Parameters are the same as for bl.rglob.irglob(); path limits the search to a subtree.
+        """
+        path = path or self.root
+        match_name, match_path = compile_path_pattern(pattern, str(path))
+        for fn, e in self.ientries(path=path, **kwargs):
+            if (dirs == True and e.type == DIR) or (
+                match_name(e.name) and (match_path is None or match_path(fn))
+            ):
+                yield fn, e
+
+    def rglob(self, pattern, dirs=False, sort=True, **kwargs):
+        """return the paths in the index that match the pattern, like bl.rglob.rglob()"""
+        fns = [fn for fn, e in self.irglob(pattern, dirs=dirs, **kwargs)]
+        if sort == True:
+            fns.sort()
+        return fns
+
+    def reldir(self, path=None):
+        """the path relative to the index root"""
+        if path is None:
+            return ''
+        reldir = os.path.relpath(str(path), self.root)
+        if reldir == '.':
+            return ''
+        elif reldir.split(os.sep)[0] == '..':
+            raise ValueError("%r is not within %r" % (str(path), self.root))
+        return reldir
@@ -0,0 +1,83 @@
+"""
+Disk usage of directory trees, computed in-process with os.scandir() (no `du` subprocess), in
+exact bytes: the apparent size (the sum of the file sizes) and the allocated size (the disk
+blocks used). As with `du`, symlinks are not followed, and hard-linked files are counted once.
+"""
+
+import heapq, os
+from bl.dict import Dict
+from bl.dirindex import DIR
+from bl.rglob import walk
+
+
+def disk_usage(path, **params):
+    """return a Dict(apparent=, allocated=, files=, dirs=) for the tree at path, with the sizes
+    in bytes. params are as for usage().
+    """
+    return usage(path, top=0, **params).total
+
+
+def usage(path, top=10, key='allocated', index=None, **params):
+    """report the disk usage of the tree at path, and the top-N largest subtrees, in one pass.
+    Returns Dict(total=Dict(apparent=, allocated=, files=, dirs=), top=[Dict(path=, apparent=,
+    allocated=), ...]), with the sizes in bytes.
+        top=10              = the number of largest subtrees (directories at any depth) to report
+        key='allocated'     = which size to rank the subtrees by: 'allocated' or 'apparent'
+        index=None          = a bl.dirindex.DirIndex that includes path, to use instead of scanning
+                                (hard links are not detected in an index, so are counted each time)
+        **params            = passed to bl.rglob.walk(), e.g. workers=8 to scan in parallel
+    """
+    path = str(path)
+    if path != os.sep:
+        path = path.rstrip(os.sep)
+    sizes = {path: [0, 0]}  # dirpath -> [apparent, allocated] of the files directly in it
+    total = Dict(apparent=0, allocated=0, files=0, dirs=0)
+    if index is not None:
+        for fn, e in index.ientries(path=path):
+            if e.type == DIR:
+                sizes.setdefault(fn, [0, 0])
+                total.dirs += 1
+            else:
+                allocated = e.size if e.blocks is None else e.blocks * 512
+                add_size(sizes, os.path.dirname(fn), e.size, allocated)
+                total.files += 1
+    else:
+        inodes = set()
+        for entry in walk(path, follow_symlinks=False, stat=True, **params):
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue  # removed while scanning
+            if entry.is_dir(follow_symlinks=False):
+                sizes.setdefault(entry.path, [0, 0])
+                total.dirs += 1
+                continue
+            if st.st_nlink > 1:
+                if (st.st_dev, st.st_ino) in inodes:
+                    continue
+                inodes.add((st.st_dev, st.st_ino))
+            allocated = getattr(st, 'st_blocks', None)
+            allocated = st.st_size if allocated is None else allocated * 512
+            add_size(sizes, os.path.dirname(entry.path), st.st_size, allocated)
+            total.files += 1
+
+    # add the size of each directory to its parent, from the deepest directories up
+    for dirpath in sorted(sizes, key=lambda d: d.count(os.sep), reverse=True):
+        if dirpath != path:
+            add_size(sizes, os.path.dirname(dirpath), *sizes[dirpath])
+    total.apparent, total.allocated = sizes[path]
+
+    i = ['apparent', 'allocated'].index(key)
+    largest = heapq.nlargest(
+        top, [d for d in sizes if d != path], key=lambda d: sizes[d][i]
+    )
+    return Dict(
+        total=total,
+        top=[Dict(path=d, apparent=sizes[d][0], allocated=sizes[d][1]) for d in largest],
+    )
+
+
+def add_size(sizes, dirpath, apparent, allocated):
+    s = sizes.setdefault(dirpath, [0, 0])
+    s[0] += apparent
+    s[1] += allocated
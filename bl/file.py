@@ -1,15 +1,30 @@
 
-import os, re, subprocess, sys, time, traceback, datetime, shutil
+import os, re, subprocess, sys, time, traceback, datetime, shutil, hashlib, mmap
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from stat import S_ISDIR, S_ISREG
 from bl.dict import Dict
+from bl.id import random_id
 from bl.string import String
-from bl.rglob import rglob
+from bl.rglob import irglob, walk
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
 
 import logging
 
 log = logging.getLogger(__name__)
 
+FICLONE = 0x40049409  # ioctl to make a reflink (copy-on-write clone) on Linux
+
 
 class File(Dict):
+    CHUNK_SIZE = 1024 * 1024  # default size for streaming reads and writes
+    STAT_TTL = None  # seconds that a stat snapshot stays current (None = until refresh())
+    stat_calls_saved = 0  # the number of stat calls that have been answered from snapshots
+
     def __init__(self, fn=None, data=None, ext=None, **args):
         if type(fn) == str:
             fn = self.normpath(fn)
@@ -28,6 +43,49 @@ class File(Dict):
     def __lt__(self, other):
         return self.fn < other.fn
 
+    @classmethod
+    def from_entry(C, entry, **args):
+        """create a File from an os.DirEntry (from os.scandir() or bl.rglob.walk()), with the 
+        entry as its stat snapshot, so that isdir, isfile, exists, stat(), size, mtime, etc. are 
+        answered from the entry's cached file type and stat() rather than by new stat calls.
+        """
+        file = C(fn=entry.path, **args)
+        file.__dict__.update(__entry__=entry, __stat__=None, __stat_time__=time.time())
+        return file
+
+    def refresh(self):
+        """take a new stat snapshot of the file, to be used until it expires (after File.STAT_TTL
+        seconds, if that is set) or is refreshed again. Returns self.
+        """
+        try:
+            stat = os.stat(self.fn)
+        except (OSError, TypeError):
+            stat = None  # the snapshot records that the file does not exist
+        self.__dict__.update(__entry__=None, __stat__=stat, __stat_time__=time.time())
+        return self
+
+    def stat_snapshot(self):
+        """return the current stat snapshot as (entry, stat), or None if there is none. An entry
+        snapshot (from_entry()) has stat None until it is first needed; a refresh() snapshot has 
+        entry None, and stat None if the file did not exist.
+        """
+        t = self.__dict__.get('__stat_time__')
+        if t is None:
+            return
+        if self.STAT_TTL is not None and time.time() - t >= self.STAT_TTL:
+            self.__dict__.update(__entry__=None, __stat__=None, __stat_time__=None)
+            return
+        File.stat_calls_saved += 1
+        return self.__dict__['__entry__'], self.__dict__['__stat__']
+
+    def __getstate__(self):
+        # the stat snapshot is not pickled or copied: an os.DirEntry can't be, and a snapshot 
+        # would be stale in another process anyway
+        state = Dict.__getstate__(self) or {}
+        for key in ['__entry__', '__stat__', '__stat_time__']:
+            state.pop(key, None)
+        return state or None
+
     def open(self):
         subprocess.call(['open', fn], shell=True)
 
@@ -37,6 +95,100 @@ class File(Dict):
                 data = f.read()
             return data
 
+    def iter_chunks(self, size=None, mode='rb'):
+        """yield the contents of the file in chunks of the given size (default File.CHUNK_SIZE)"""
+        if self.fn is not None and os.path.exists(self.fn):
+            with open(self.fn, mode) as f:
+                chunk = f.read(size or self.CHUNK_SIZE)
+                while len(chunk) > 0:
+                    yield chunk
+                    chunk = f.read(size or self.CHUNK_SIZE)
+
+    def iter_lines(self, mode='rb', encoding=None):
+        """yield the lines of the file (with line endings). In text mode, the encoding defaults to
+        self.encoding or UTF-8.
+        """
+        if self.fn is not None and os.path.exists(self.fn):
+            if 'b' in mode:
+                f = open(self.fn, mode)
+            else:
+                f = open(self.fn, mode, encoding=encoding or self.encoding or 'UTF-8')
+            with f:
+                for line in f:
+                    yield line
+
+    @contextmanager
+    def mmap(self, write=False):
+        """a context manager giving a memory-mapped, zero-copy view of the file's contents.
+        The view supports the buffer protocol, so it can be sliced through a memoryview,
+        searched with re (as bytes), or decoded with str(view, encoding), without a copy.
+        A file that can't be mapped (a pipe, or a pseudo-file that reports size 0, as in /proc) 
+        is read instead, giving its contents as bytes (for write=True, an empty file gives b'').
+        Only map files that no other process will truncate while they are mapped (as writing 
+        with mode 'wb' does): touching the pages beyond the new end kills the process with 
+        SIGBUS rather than raising an exception. (Text and JSON read their files with read().)
+        """
+        with open(self.fn, 'r+b' if write == True else 'rb') as f:
+            view = None
+            if os.fstat(f.fileno()).st_size > 0:
+                access = mmap.ACCESS_WRITE if write == True else mmap.ACCESS_READ
+                try:
+                    view = mmap.mmap(f.fileno(), 0, access=access)
+                except (OSError, ValueError):
+                    if write == True:
+                        raise
+            if view is None:
+                yield b'' if write == True else f.read()
+            else:
+                with view:
+                    yield view
+
+    def copy_to(self, outfn, mode='wb', reflink=False):
+        """stream the contents of this file to outfn. In binary mode, the data is copied by the 
+        kernel where possible (see copy_fileobj()).
+        """
+        if 'b' in mode:
+            with open(self.fn, 'rb', buffering=0) as src, open(outfn, mode, buffering=0) as dst:
+                self.copy_fileobj(src, dst, reflink=reflink)
+        else:
+            with open(outfn, mode) as f:
+                for chunk in self.iter_chunks(mode='r'):
+                    f.write(chunk)
+
+    @classmethod
+    def copy_fileobj(C, src, dst, reflink=False):
+        """copy the contents of the open binary file src to dst without passing the data through 
+        Python: by reflink (a copy-on-write clone, if reflink=True and the filesystem supports it),
+        os.copy_file_range(), or os.sendfile(), whichever works first; otherwise in chunks.
+        """
+        size = os.fstat(src.fileno()).st_size
+        if reflink == True and fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError as e:
+                log.debug("reflink not available: %s" % e)
+        copied = 0
+        if size > 0:  # files in /proc etc. report 0 size and must be read
+            for method in ['copy_file_range', 'sendfile']:
+                if not hasattr(os, method):
+                    continue
+                try:
+                    while True:
+                        if method == 'copy_file_range':
+                            n = os.copy_file_range(
+                                src.fileno(), dst.fileno(), C.CHUNK_SIZE * 64, copied
+                            )
+                        else:
+                            n = os.sendfile(dst.fileno(), src.fileno(), copied, C.CHUNK_SIZE * 64)
+                        if n == 0:
+                            return
+                        copied += n
+                except OSError as e:
+                    log.debug("%s not available: %s" % (method, e))
+        src.seek(copied)
+        shutil.copyfileobj(src, dst, C.CHUNK_SIZE)
+
     def dirpath(self):
         return self.normpath(os.path.dirname(os.path.abspath(self.fn)))
 
@@ -54,44 +206,64 @@ class File(Dict):
         return p
 
     @classmethod
-    def match(Class, path, pattern, flags=re.I, sortkey=None, ext=None):
-        """for a given path and regexp pattern, return the files that match"""
-        return sorted(
-            [
-                Class(fn=fn)
-                for fn in rglob(path, f"*{ext or ''}")
-                if re.search(pattern, os.path.basename(fn), flags=flags) is not None
-                and os.path.basename(fn)[0] != '~'  # omit temp files
-            ],
-            key=sortkey,
-        )
+    def match(Class, path, pattern, flags=re.I, sortkey=None, ext=None, index=None):
+        """for a given path and regexp pattern, return the files that match.
+        If a bl.dirindex.DirIndex that includes the path is given, it is queried instead.
+        """
+        regex = re.compile(pattern, flags=flags) if isinstance(pattern, str) else pattern
+        if index is not None:
+            fns = index.rglob(f"*{ext or ''}", path=path, sort=False, exclude=['~*'])
+            files = [Class(fn=fn) for fn in fns if regex.search(os.path.basename(fn)) is not None]
+        else:
+            entries = irglob(path, f"*{ext or ''}", entries=True, exclude=['~*'])  # omit temp files
+            files = [Class.from_entry(e) for e in entries if regex.search(e.name) is not None]
+        return sorted(files, key=sortkey)
 
     @property
     def isdir(self):
-        return os.path.isdir(str(self.fn))
+        snapshot = self.stat_snapshot()
+        if snapshot is None:
+            return os.path.isdir(str(self.fn))
+        entry, stat = snapshot
+        if entry is not None:
+            return entry.is_dir()
+        return stat is not None and S_ISDIR(stat.st_mode)
 
     @property
     def isfile(self):
-        return os.path.isfile(str(self.fn))
+        snapshot = self.stat_snapshot()
+        if snapshot is None:
+            return os.path.isfile(str(self.fn))
+        entry, stat = snapshot
+        if entry is not None:
+            return entry.is_file()
+        return stat is not None and S_ISREG(stat.st_mode)
 
     @property
     def exists(self):
-        return os.path.exists(str(self.fn))
+        snapshot = self.stat_snapshot()
+        if snapshot is None:
+            return os.path.exists(str(self.fn))
+        entry, stat = snapshot
+        if entry is not None:
+            return entry.is_file() or entry.is_dir() or os.path.exists(entry.path)
+        return stat is not None
 
     def makedir(self):
         os.makedirs(str(self.fn))
 
-    def file_list(self, depth=None):
+    def file_list(self, depth=None, **kwargs):
+        """list the files and folders in the tree below this folder. As with os.walk(), symlinks 
+        to folders are neither walked nor listed.
+            depth=None  = if given, the number of levels below this folder to list
+            **kwargs    = exclude, prune, workers, ordered: see bl.rglob.walk()
+        """
         fl = []
         if self.isdir:
-            for folder in os.walk(self.fn):
-                if folder[0] != self.fn:
-                    fl.append(File(fn=folder[0]))  # add the folder itself
-                for fb in folder[2]:
-                    fl.append(File(fn=os.path.join(folder[0], fb)))
-        if depth is not None:
             fl = [
-                fi for fi in fl if len(os.path.relpath(fi.fn, self.fn).split(os.path.sep)) <= depth
+                File.from_entry(entry)
+                for entry in walk(self.fn, depth=depth, follow_symlinks=False, **kwargs)
+                if not (entry.is_symlink() and entry.is_dir())
             ]
         return fl
 
@@ -121,13 +293,28 @@ class File(Dict):
     def name(self):
         return self.splitext(fn=self.basename)[0]
 
-    def copy(self, new_fn):
-        """copy the file to the new_fn, preserving atime and mtime"""
+    def copy(self, new_fn, reflink=False):
+        """copy the file to the new_fn, preserving atime and mtime. The data is copied by the 
+        kernel where possible; reflink=True makes a copy-on-write clone where supported.
+        """
         new_file = self.__class__(fn=str(new_fn))
-        new_file.write(data=self.read())
-        new_file.utime(self.atime, self.mtime)
+        dirpath = os.path.dirname(new_file.fn)
+        if dirpath != '' and not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+        self.copy_to(new_file.fn, reflink=reflink)
+        stat = self.stat()
+        new_file.utime(ns=(stat.st_atime_ns, stat.st_mtime_ns))
         return new_file
 
+    @classmethod
+    def copy_many(C, pairs, workers=8, **params):
+        """copy each (file, new_fn) in pairs, running the copies in a pool of threads, and return 
+        the list of new files. params are as for copy().
+        """
+        pairs = [(f if isinstance(f, File) else C(fn=str(f)), new_fn) for f, new_fn in pairs]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda pair: pair[0].copy(pair[1], **params), pairs))
+
     def clean_filename(self, fn=None, ext=None):
         fn = fn or self.fn or ''
         if fn not in [None, '']:
@@ -151,23 +338,69 @@ class File(Dict):
         return os.path.relpath(self.fn, str(dirpath or self.dirpath())).replace('\\', '/')
 
     def stat(self):
+        """the os.stat() of the file, from the stat snapshot if there is a current one"""
+        snapshot = self.stat_snapshot()
+        if snapshot is not None:
+            entry, stat = snapshot
+            if stat is None and entry is not None:
+                stat = self.__dict__['__stat__'] = entry.stat()  # cached by the entry
+            if stat is not None:
+                return stat
         return os.stat(self.fn)
 
-    def hash(self, **params):
-        d = self.read()
-        if d is not None:
-            return String(d).digest(**params)
+    def hash(self, alg='sha256', b64=True, strip=True, cache=None):
+        """return a url-safe hash of the file contents, read in chunks. The alg, b64, and strip 
+        options are the same as for String.digest(). If a bl.hashcache.HashCache is given, 
+        the hash of an unchanged file is taken from it, and new hashes are added to it.
+        """
+        if self.fn is None or not os.path.exists(self.fn):
+            return
+        if cache is not None:
+            stat = os.stat(self.fn)  # not the stat snapshot, which may be out of date
+            digest = cache.get(stat, alg)
+            if digest is not None:
+                return String.format_digest(digest, b64=b64, strip=strip)
+        h = hashlib.new(alg)
+        for chunk in self.iter_chunks():
+            h.update(chunk)
+        digest = h.digest()
+        if cache is not None:
+            new_stat = os.stat(self.fn)
+            if (new_stat.st_size, new_stat.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                cache.set(stat, alg, digest)  # not modified while hashing
+        return String.format_digest(digest, b64=b64, strip=strip)
+
+    def hash_sample(self, size=64 * 1024, alg='sha256'):
+        """return a digest (bytes) of the first and last `size` bytes of the file and its length:
+        a cheap test of whether two files can be the same. A file no longer than 2 * size is 
+        hashed entire, so then equal samples mean equal contents.
+        """
+        h = hashlib.new(alg)
+        with open(self.fn, 'rb') as f:
+            length = os.fstat(f.fileno()).st_size
+            h.update(str(length).encode() + b':')
+            h.update(f.read(size))
+            if length > size:
+                f.seek(max(size, length - size))
+                h.update(f.read(size))
+        return h.digest()
+
+    @classmethod
+    def hash_many(C, files, workers=8, **params):
+        """return the hashes of the given files (or filenames), in order, hashing them in a pool
+        of threads. params are as for hash().
+        """
+        files = [f if isinstance(f, File) else C(fn=str(f)) for f in files]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda f: f.hash(**params), files))
 
     @property
     def size(self):
+        """the size of the file in bytes; for a folder, the total (apparent) size of its files"""
         if self.isdir:
-            s = (
-                subprocess.check_output(['du', '-sh', self.fn])
-                .decode('utf-8')
-                .split('\t')[0]
-                .strip()
-            )
-            return self.bytes_from_readable_size(s)
+            from .du import disk_usage
+
+            return disk_usage(self.fn).apparent
         elif self.isfile:
             return self.stat().st_size
 
@@ -183,8 +416,13 @@ class File(Dict):
     def atime(self):
         return self.stat().st_atime
 
-    def utime(self, atime, mtime):
-        os.utime(self.fn, times=(atime, mtime))
+    def utime(self, atime=None, mtime=None, ns=None):
+        """set the atime and mtime of the file, in seconds, or as ns=(atime_ns, mtime_ns)"""
+        if ns is not None:
+            os.utime(self.fn, ns=ns)
+        else:
+            os.utime(self.fn, times=(atime, mtime))
+        self.__dict__['__stat_time__'] = None
 
     @property
     def mimetype(self):
@@ -198,41 +436,103 @@ class File(Dict):
         self.write(tf.name, mode=mode, **args)
         return tfn
 
-    def write(
-        self, fn=None, data=None, mode='wb', max_tries=3
-    ):  # sometimes there's a disk error on SSD, so try 3x
-        def try_write(fd, outfn, tries=0):
+    def write(self, fn=None, data=None, mode='wb', max_tries=3, atomic=False, fsync=False):
+        """write the data (or self.data; if both are None, the contents of self.fn) to fn or self.fn.
+            mode='wb'       = the file mode
+            max_tries=3     = sometimes there's a disk error on SSD, so retry up to 3x
+            atomic=False    = if True, write to a temporary file in the same directory and then 
+                                replace fn with it, so readers never see a partly-written file
+            fsync=False     = if True, flush the file (and, if atomic, the directory) to disk
+        The data can also be an iterator (e.g., a generator) of chunks, which is written as the 
+        chunks are produced; it is not retried, since an iterator can't be replayed.
+        """
+
+        def try_write(fd, outfn):
+            if atomic == True:
+                if 'a' in mode:
+                    raise ValueError("an atomic write replaces the file, so mode cannot be %r" % mode)
+                target = os.path.join(
+                    os.path.dirname(outfn) or '.',
+                    '.%s.%s.tmp' % (os.path.basename(outfn), random_id(8)),
+                )
+                # os.open() so that the permissions follow the umask, as with open()
+                f = open(os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), mode)
+            else:
+                target = outfn
+                f = open(outfn, mode)
             try:
-                if fd is None and os.path.exists(self.fn):
-                    if 'b' in mode:
-                        fd = self.read(mode='rb')
+                with f:
+                    if (
+                        fd is None
+                        and os.path.exists(self.fn)
+                        and os.path.abspath(target) != os.path.abspath(self.fn)
+                    ):
+                        # stream, rather than reading all of it
+                        if 'b' in mode:
+                            with open(self.fn, 'rb', buffering=0) as src:
+                                f.flush()
+                                self.copy_fileobj(src, f.raw)
+                        else:
+                            for chunk in self.iter_chunks(mode='r'):
+                                f.write(chunk)
                     else:
-                        fd = self.read(mode='r')
-                f = open(outfn, mode)
-                f.write(fd or b'')
-                f.close()
+                        if fd is None and os.path.exists(self.fn):
+                            if 'b' in mode:
+                                fd = self.read(mode='rb')
+                            else:
+                                fd = self.read(mode='r')
+                        if hasattr(fd, '__next__'):
+                            for chunk in fd:  # an iterator of chunks, written as they come
+                                f.write(chunk)
+                        else:
+                            f.write(fd or (b'' if 'b' in mode else ''))
+                    if fsync == True:
+                        f.flush()
+                        os.fsync(f.fileno())
+                if atomic == True:
+                    if os.path.exists(outfn):
+                        shutil.copymode(outfn, target)
+                    os.replace(target, outfn)
+                    if fsync == True and hasattr(os, 'O_DIRECTORY'):
+                        dirfd = os.open(os.path.dirname(outfn) or '.', os.O_DIRECTORY)
+                        try:
+                            os.fsync(dirfd)
+                        finally:
+                            os.close(dirfd)
+            except:
+                if atomic == True and os.path.exists(target):
+                    os.remove(target)
+                raise
+
+        outfn = fn or self.fn
+        if outfn == self.fn:
+            self.__dict__['__stat_time__'] = None  # the stat snapshot will be out of date
+        dirpath = os.path.dirname(outfn)
+        if dirpath != '' and not os.path.exists(dirpath):
+            log.debug("creating directory: %s" % dirpath)
+            os.makedirs(dirpath)
+        if hasattr(data, '__next__'):
+            max_tries = 0
+        for tries in range(max_tries + 1):
+            try:
+                try_write(data or self.data, outfn)
                 log.debug('wrote %s' % outfn)
+                break
             except:
-                log.warn(sys.exc_info()[1])
+                log.warning(sys.exc_info()[1])
                 if tries < max_tries:
                     log.debug(traceback.format_exc())
                     time.sleep(.1)  # I found 0.1 s gives the disk time to recover. YMMV
-                    try_write(fd, outfn, tries=tries + 1)
                 else:
                     raise
 
-        outfn = fn or self.fn
-        if not os.path.exists(os.path.dirname(outfn)):
-            log.debug("creating directory: %s" % os.path.dirname(outfn))
-            os.makedirs(os.path.dirname(outfn))
-        try_write(data or self.data, outfn, tries=0)
-
     def delete(self):
         """delete the file from the filesystem."""
         if self.isfile:
             os.remove(self.fn)
         elif self.isdir:
             shutil.rmtree(self.fn)
+        self.__dict__['__stat_time__'] = None
 
     SIZE_UNITS = ['', 'K', 'M', 'G', 'T', 'P', 'E', 'Z', 'Y']
 
@@ -0,0 +1,227 @@
+"""
+A FileSet is a compact, array-backed collection of file paths with their size, mtime, and type,
+for listings that are too large to hold as lists of File objects (each of which is a Dict with
+its own hash table). The directory paths are stored once each, the names in one packed string
+table, and the sizes, mtimes, and types in parallel arrays -- a few dozen bytes per file.
+Sorting, filtering, and set operations work on the arrays; a File (or Folder) is only created
+when an item is accessed:
+
+    files = Folder('/data/assets').fileset('*.jpg')
+    big = files.filter(min_size=10 * 1024 * 1024).sort('size', reverse=True)
+    for file in big[:10]:
+        print(file.fn, file.size)
+    new = files - FileSet(old_paths)
+"""
+
+import datetime, os, re
+from array import array
+from bl.dirindex import FILE, DIR
+
+
+class FileTable:
+    """the shared storage of one or more FileSets: a table of directory paths, and the name,
+    directory, size, mtime (ns), and type of each row, in a packed string table and arrays.
+    Rows are only ever appended, so FileSets that select rows from a table remain valid.
+    """
+
+    def __init__(self):
+        self.dirs = []  # directory paths
+        self.dir_ids = {}  # directory path -> index in self.dirs
+        self.names = bytearray()  # the encoded names, end to end
+        self.offsets = array('Q', [0])  # row i's name is names[offsets[i] : offsets[i + 1]]
+        self.dir = array('L')
+        self.size = array('q')
+        self.mtime = array('q')
+        self.type = bytearray()
+
+    def __len__(self):
+        return len(self.dir)
+
+    def append(self, path, size=-1, mtime=-1, type=FILE):
+        """append a row for the given path, returning its index"""
+        dirpath, name = os.path.split(path)
+        dir_id = self.dir_ids.get(dirpath)
+        if dir_id is None:
+            dir_id = self.dir_ids[dirpath] = len(self.dirs)
+            self.dirs.append(dirpath)
+        self.names += os.fsencode(name)
+        self.offsets.append(len(self.names))
+        self.dir.append(dir_id)
+        self.size.append(-1 if size is None else size)
+        self.mtime.append(-1 if mtime is None else mtime)
+        self.type.append(ord(type))
+        return len(self.dir) - 1
+
+    def name(self, i):
+        return os.fsdecode(bytes(self.names[self.offsets[i] : self.offsets[i + 1]]))
+
+    def path(self, i):
+        return os.path.join(self.dirs[self.dir[i]], self.name(i))
+
+
+class FileSet:
+    """a compact collection of files (see the module docstring). FileSets that are derived from
+    each other by sort(), filter(), or slicing share one FileTable, each holding only an array of
+    row indexes. Sizes are in bytes, and mtimes in nanoseconds; -1 means unknown.
+        paths=None  = an iterable of paths to add (see also add() and add_entry())
+    """
+
+    def __init__(self, paths=None, table=None, rows=None):
+        self.table = table if table is not None else FileTable()
+        self.rows = rows if rows is not None else array('L', range(len(self.table)))
+        for path in paths or []:
+            self.add(path)
+
+    def __repr__(self):
+        return "%s(<%d files>)" % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        for i in self.rows:
+            yield self.file(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.__class__(table=self.table, rows=self.rows[index])
+        return self.file(self.rows[index])
+
+    def __contains__(self, path):
+        # builds the set of paths each time; for many lookups, use pathset()
+        return str(path) in self.pathset()
+
+    def file(self, i):
+        """the File (or Folder) for row i of the table"""
+        from bl.file import File
+        from bl.folder import Folder
+
+        return (Folder if self.table.type[i] == ord(DIR) else File)(fn=self.table.path(i))
+
+    def add(self, path, size=None, mtime=None, type=FILE):
+        """add a file with the given path, size (bytes), mtime (ns), and type (FILE or DIR)"""
+        self.rows.append(self.table.append(str(path), size=size, mtime=mtime, type=type))
+
+    def add_entry(self, entry):
+        """add a file from an os.DirEntry (e.g., from bl.rglob.walk()), using its stat()"""
+        try:
+            stat = entry.stat()
+            size, mtime = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size = mtime = None  # a broken symlink, or removed
+        self.add(entry.path, size=size, mtime=mtime, type=DIR if entry.is_dir() else FILE)
+
+    def path(self, index):
+        """the path of the item at the given index"""
+        return self.table.path(self.rows[index])
+
+    def paths(self):
+        """iterate over the paths of the items"""
+        for i in self.rows:
+            yield self.table.path(i)
+
+    def pathset(self):
+        return set(self.paths())
+
+    def sizes(self):
+        return [self.table.size[i] for i in self.rows]
+
+    def mtimes(self):
+        return [self.table.mtime[i] for i in self.rows]
+
+    def total_size(self):
+        """the total size of the files in bytes (not counting unknown sizes)"""
+        return sum(self.table.size[i] for i in self.rows if self.table.size[i] > 0)
+
+    # == sorting and filtering: each returns a new FileSet that shares the table ==
+
+    SORT_KEYS = {
+        'path': lambda t: t.path,
+        'name': lambda t: t.name,
+        'ext': lambda t: lambda i: os.path.splitext(t.name(i))[-1].lower(),
+        'size': lambda t: t.size.__getitem__,
+        'mtime': lambda t: t.mtime.__getitem__,
+    }
+
+    def sort(self, key='path', reverse=False):
+        """return a new FileSet sorted by key: 'path', 'name', 'ext', 'size', or 'mtime'"""
+        rows = sorted(self.rows, key=self.SORT_KEYS[key](self.table), reverse=reverse)
+        return self.__class__(table=self.table, rows=array('L', rows))
+
+    def filter(
+        self, ext=None, regex=None, min_size=None, max_size=None, since=None, before=None,
+        type=None,
+    ):
+        """return a new FileSet of the items that meet all the given conditions:
+            ext         = an extension ('.jpg') or list of extensions, compared case-insensitively
+            regex       = a regexp (string or compiled) that is searched in the name
+            min_size    = the minimum size in bytes
+            max_size    = the maximum size in bytes
+            since       = the earliest mtime, as a datetime or timestamp (inclusive)
+            before      = the mtime that all must be earlier than, as a datetime or timestamp
+            type        = FILE or DIR (bl.dirindex.FILE = 'f', bl.dirindex.DIR = 'd')
+        """
+        t = self.table
+        tests = []
+        if ext is not None:
+            exts = tuple(e.lower() for e in ([ext] if isinstance(ext, str) else ext))
+            tests.append(lambda i: os.path.splitext(t.name(i))[-1].lower() in exts)
+        if regex is not None:
+            regex = re.compile(regex) if isinstance(regex, str) else regex
+            tests.append(lambda i: regex.search(t.name(i)) is not None)
+        if min_size is not None:
+            tests.append(lambda i: t.size[i] >= min_size)
+        if max_size is not None:
+            tests.append(lambda i: 0 <= t.size[i] <= max_size)
+        if since is not None:
+            since_ns = self.timestamp_ns(since)
+            tests.append(lambda i: t.mtime[i] >= since_ns)
+        if before is not None:
+            before_ns = self.timestamp_ns(before)
+            tests.append(lambda i: 0 <= t.mtime[i] < before_ns)
+        if type is not None:
+            type_code = ord(type)
+            tests.append(lambda i: t.type[i] == type_code)
+        rows = array('L', (i for i in self.rows if all(test(i) for test in tests)))
+        return self.__class__(table=self.table, rows=rows)
+
+    @classmethod
+    def timestamp_ns(C, t):
+        if isinstance(t, datetime.datetime):
+            t = t.timestamp()
+        return int(t * 1e9)
+
+    # == set operations, by path ==
+
+    def union(self, other):
+        """a FileSet of the items in either set (the first of each path)"""
+        result = self.__class__(table=self.table, rows=array('L', self.rows))
+        paths = self.pathset()
+        for i in other.rows:
+            path = other.table.path(i)
+            if path not in paths:
+                paths.add(path)
+                if other.table is self.table:
+                    result.rows.append(i)
+                else:
+                    result.add(
+                        path, size=other.table.size[i], mtime=other.table.mtime[i],
+                        type=chr(other.table.type[i]),
+                    )
+        return result
+
+    def intersection(self, other):
+        """a FileSet of the items in this set whose paths are also in the other"""
+        paths = other.pathset()
+        rows = array('L', (i for i in self.rows if self.table.path(i) in paths))
+        return self.__class__(table=self.table, rows=rows)
+
+    def difference(self, other):
+        """a FileSet of the items in this set whose paths are not in the other"""
+        paths = other.pathset()
+        rows = array('L', (i for i in self.rows if self.table.path(i) not in paths))
+        return self.__class__(table=self.table, rows=rows)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
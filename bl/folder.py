@@ -1,6 +1,9 @@
-import glob, logging, os
+import glob, logging, os, shutil, sys, time
+from concurrent.futures import ThreadPoolExecutor
 import bl.rglob
+from .dict import Dict
 from .file import File
+from .dirindex import DIR
 
 log = logging.getLogger(__name__)
 
@@ -14,7 +17,32 @@ class Folder(File):
         else:
             return Folder(fn=fn)
 
+    def __getstate__(self):
+        # a copy is not watched: the live index (see watch()) belongs to this Folder
+        state = File.__getstate__(self) or {}
+        state.pop('__index__', None)
+        return state or None
+
     def glob(self, pattern, folders=True):
+        index = self.__dict__.get('__index__')
+        if index is not None:
+            return [
+                Folder(fn) if e.type == DIR else File(fn)
+                for fn, e in index.iglob(pattern, path=self.fn)
+                if folders is True or e.type != DIR
+            ]
+        if os.sep not in pattern and '/' not in pattern:
+            # list the folder once; the entries are the stat snapshots of the results
+            match = bl.rglob.compile_name_pattern(pattern)
+            try:
+                entries = bl.rglob.scandir(self.fn)
+            except OSError:
+                entries = []
+            return [
+                Folder.from_entry(e) if e.is_dir() else File.from_entry(e)
+                for e in entries
+                if match(e.name) and (folders is True or not e.is_dir())
+            ]
         results = [
             file
             for file in [File(r) for r in glob.glob(str(Folder(self / pattern)))]
@@ -25,8 +53,251 @@ class Folder(File):
                 results[i] = Folder(results[i])
         return results
 
-    def rglob(self, pattern, **kwargs):
-        return [
-            Folder(r) if os.path.isdir(r) else File(r)
-            for r in bl.rglob.rglob(self.fn, pattern, **kwargs)
+    def rglob(self, pattern, index=None, sort=True, **kwargs):
+        """recursive glob within this folder; kwargs as bl.rglob.rglob() (dirs, workers...).
+        If a bl.dirindex.DirIndex that includes this folder is given, or the folder is being 
+        watched (see watch()), the index is queried instead.
+        """
+        if index is None:
+            index = self.__dict__.get('__index__')
+        if index is not None:
+            results = list(index.irglob(pattern, path=self.fn, **kwargs))
+            if sort == True:
+                results.sort()
+            return [Folder(fn) if e.type == DIR else File(fn) for fn, e in results]
+        results = [
+            Folder.from_entry(e) if e.is_dir() else File.from_entry(e)
+            for e in bl.rglob.irglob(self.fn, pattern, entries=True, **kwargs)
         ]
+        if sort == True:
+            results.sort()
+        return results
+
+    def fileset(self, pattern='*', index=None, **kwargs):
+        """a bl.fileset.FileSet of the files (and, with dirs=True, folders) in this folder's tree 
+        that match the pattern, with their sizes and mtimes; kwargs as bl.rglob.irglob(). If an 
+        index is given or the folder is being watched, the index is queried instead.
+        """
+        from .fileset import FileSet
+
+        fileset = FileSet()
+        if index is None:
+            index = self.__dict__.get('__index__')
+        if index is not None:
+            for fn, e in index.irglob(pattern, path=self.fn, **kwargs):
+                fileset.add(fn, size=e.size, mtime=e.mtime, type=e.type)
+        else:
+            for entry in bl.rglob.irglob(self.fn, pattern, entries=True, stat=True, **kwargs):
+                fileset.add_entry(entry)
+        return fileset
+
+    def file_list(self, depth=None, **kwargs):
+        index = self.__dict__.get('__index__')
+        if index is not None:
+            return [File(fn=fn) for fn, e in index.ientries(path=self.fn, depth=depth, **kwargs)]
+        return File.file_list(self, depth=depth, **kwargs)
+
+    def sync(
+        self, dest, hash=False, delete=False, workers=8, dry_run=False, prune=None, reflink=False
+    ):
+        """mirror this folder's tree to dest, copying only the files that are new or changed, as
+        judged by size and mtime (copies keep the mtime, so an unchanged file is skipped next time).
+        Returns a report: Dict(copied=, skipped=, deleted=), each Dict(files=, bytes=), plus 
+        dirs (the number of folders created), errors [(relpath, exception), ...], and 
+        time=Dict(scan=, copy=, delete=, total=) in seconds.
+            hash=False      = if True, also compare the contents of files whose size and mtime 
+                                match, and copy them if they differ
+            delete=False    = if True, delete the files and folders in dest that are not in this
+                                folder (and files whose type has changed are always replaced)
+            workers=8       = the number of threads for scanning, comparing, and copying
+            dry_run=False   = if True, report what would be done without changing anything
+            prune=None      = names (glob patterns or compiled regexes) of folders to skip
+            reflink=False   = if True, make copy-on-write clones where supported (see File.copy)
+        """
+        t0 = time.time()
+        report = Dict(
+            copied=Dict(files=0, bytes=0),
+            skipped=Dict(files=0, bytes=0),
+            deleted=Dict(files=0, bytes=0),
+            dirs=0,
+            errors=[],
+            time=Dict(),
+        )
+        src, dest = self.fn, File.normpath(str(dest))
+        src_entries = {
+            os.path.relpath(e.path, src): e for e in bl.rglob.walk(src, prune=prune, workers=workers, stat=True)
+        }
+        dest_entries = {}
+        if os.path.isdir(dest):
+            dest_entries = {
+                os.path.relpath(e.path, dest): e
+                for e in bl.rglob.walk(
+                    dest, prune=prune, workers=workers, follow_symlinks=False, stat=True
+                )
+            }
+        report.time.scan = time.time() - t0
+
+        # remove what is not in the source, or has changed type
+        t = time.time()
+        removed = set()
+
+        def is_removed(relpath):
+            while relpath != '':
+                if relpath in removed:
+                    return True
+                relpath = os.path.dirname(relpath)
+            return False
+
+        for relpath in sorted(dest_entries):
+            e = dest_entries[relpath]
+            src_entry = src_entries.get(relpath)
+            if src_entry is None:
+                if delete != True:
+                    continue
+            elif src_entry.is_dir() == e.is_dir(follow_symlinks=False):
+                continue
+            if is_removed(os.path.dirname(relpath)):
+                continue  # removed with its folder
+            removed.add(relpath)
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    from .du import disk_usage
+
+                    usage = disk_usage(e.path)
+                    report.deleted.files += usage.files
+                    report.deleted.bytes += usage.apparent
+                    if dry_run != True:
+                        shutil.rmtree(e.path)
+                else:
+                    report.deleted.files += 1
+                    report.deleted.bytes += e.stat(follow_symlinks=False).st_size
+                    if dry_run != True:
+                        os.remove(e.path)
+            except OSError:
+                log.error("could not delete %s: %s" % (e.path, sys.exc_info()[1]))
+                report.errors.append((relpath, sys.exc_info()[1]))
+        dest_entries = {r: e for r, e in dest_entries.items() if not is_removed(r)}
+        report.time.delete = time.time() - t
+
+        # create the folders, then compare and copy the files in parallel
+        t = time.time()
+        for relpath in sorted(src_entries):
+            if src_entries[relpath].is_dir() and relpath not in dest_entries:
+                report.dirs += 1
+                if dry_run != True:
+                    os.makedirs(os.path.join(dest, relpath), exist_ok=True)
+
+        def sync_file(relpath):
+            file = File.from_entry(src_entries[relpath])
+            e = dest_entries.get(relpath)
+            if e is not None and e.is_symlink():
+                # a symlink in dest is a type change: replace the link, never write through it
+                if dry_run != True:
+                    os.remove(e.path)
+            elif e is not None:
+                dest_file = File.from_entry(e)
+                st, dest_st = file.stat(), dest_file.stat()
+                if (st.st_size, st.st_mtime_ns) == (dest_st.st_size, dest_st.st_mtime_ns) and (
+                    hash != True or file.hash() == dest_file.hash()
+                ):
+                    return 'skipped', st.st_size
+            if dry_run != True:
+                file.copy(os.path.join(dest, relpath), reflink=reflink)
+            return 'copied', file.size
+
+        def try_sync_file(relpath):
+            try:
+                return relpath, sync_file(relpath), None
+            except Exception:
+                return relpath, None, sys.exc_info()[1]
+
+        relpaths = sorted(r for r, e in src_entries.items() if not e.is_dir())
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for relpath, result, error in pool.map(try_sync_file, relpaths):
+                if error is not None:
+                    log.error("could not copy %s: %s" % (relpath, error))
+                    report.errors.append((relpath, error))
+                else:
+                    action, size = result
+                    report[action].files += 1
+                    report[action].bytes += size or 0
+        report.time.copy = time.time() - t
+        report.time.total = time.time() - t0
+        return report
+
+    def duplicates(self, min_size=1, sample_size=64 * 1024, workers=8, **kwargs):
+        """find the sets of identical files in this folder's tree, reading as little as possible:
+        the files are grouped by size, then files of the same size by a hash of their first and
+        last sample_size bytes (File.hash_sample()), and only the files that still match are hashed 
+        in full (File.hash(), streaming). Hard links to the same file are reported once, and 
+        symlinks are not followed. Returns a list of lists of Files, largest files first.
+            min_size=1      = the size of the smallest files to consider
+            sample_size     = the number of bytes to sample from each end of the files
+            workers=8       = the number of threads for hashing
+            **kwargs        = exclude, prune, depth: see bl.rglob.walk()
+        """
+        by_size = {}
+        inodes = set()
+        for entry in bl.rglob.walk(self.fn, follow_symlinks=False, stat=True, **kwargs):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue  # removed while scanning
+            if st.st_size < min_size or (st.st_dev, st.st_ino) in inodes:
+                continue
+            inodes.add((st.st_dev, st.st_ino))
+            by_size.setdefault(st.st_size, []).append(File.from_entry(entry))
+
+        def regroup(groups, key):
+            """split each group by key(file), in parallel, keeping the groups of 2 or more"""
+            files = [file for group in groups for file in group]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                keys = list(pool.map(lambda file: try_key(key, file), files))
+            result = {}
+            for file, k in zip(files, keys):
+                if k is not None:
+                    result.setdefault((file.size, k), []).append(file)
+            return [group for group in result.values() if len(group) > 1]
+
+        def try_key(key, file):
+            try:
+                return key(file)
+            except OSError:
+                log.warning("could not read %s: %s" % (file.fn, sys.exc_info()[1]))
+
+        groups = [group for group in by_size.values() if len(group) > 1]
+        groups = regroup(groups, lambda file: file.hash_sample(size=sample_size))
+        sampled = [g for g in groups if g[0].size <= 2 * sample_size]  # sampled entire
+        groups = sampled + regroup(
+            [g for g in groups if g[0].size > 2 * sample_size], lambda file: file.hash()
+        )
+        return sorted(
+            [sorted(group) for group in groups], key=lambda group: (-group[0].size, group[0].fn)
+        )
+
+    def watch(self, **kwargs):
+        """keep an in-memory index of this folder's tree up to date as files change (Linux only),
+        so that glob(), rglob() and file_list() are served from memory. Returns the 
+        bl.watch.LiveIndex; kwargs are passed to it.
+        """
+        from .watch import LiveIndex
+
+        self.unwatch()
+        index = self.__dict__['__index__'] = LiveIndex(root=self.fn, **kwargs).start()
+        return index
+
+    def unwatch(self):
+        """stop watching this folder (see watch())"""
+        index = self.__dict__.pop('__index__', None)
+        if index is not None:
+            index.stop()
+
+    def usage(self, top=10, **params):
+        """report the disk usage of this folder and its top-N largest subfolders, in one pass.
+        See bl.du.usage() for the params and the report.
+        """
+        from .du import usage
+
+        return usage(self.fn, top=top, **params)
@@ -0,0 +1,41 @@
+import threading
+from bl.json import JSON
+
+
+class HashCache(JSON):
+    """a persistent cache of file hashes, stored as JSON, for use with File.hash(cache=...) and
+    File.hash_many(cache=...). Each hash is keyed by the (device, inode, size, mtime_ns) of the
+    file and the hash algorithm, so a file that has not changed is never hashed again.
+
+        cache = HashCache(fn='/var/cache/hashes.json')
+        digests = File.hash_many(files, cache=cache)
+        cache.write()                   # only needed if cache.changed
+    """
+
+    def __init__(self, fn=None, **params):
+        super().__init__(fn=fn, **params)
+        if self.data is None:
+            self.data = {}
+        self.__dict__['lock'] = threading.Lock()
+        self.__dict__['changed'] = False
+
+    @classmethod
+    def key(C, stat, alg):
+        return "%d:%d:%d:%d:%s" % (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, alg)
+
+    def get(self, stat, alg):
+        """return the cached digest (bytes) for the file with the given os.stat() result, or None"""
+        digest = self.data.get(self.key(stat, alg))
+        if digest is not None:
+            return bytes.fromhex(digest)
+
+    def set(self, stat, alg, digest):
+        """cache the digest (bytes) for the file with the given os.stat() result"""
+        with self.lock:
+            self.data[self.key(stat, alg)] = digest.hex()
+            self.__dict__['changed'] = True
+
+    def write(self, fn=None, **params):
+        with self.lock:
+            super().write(fn=fn, **params)
+            self.__dict__['changed'] = False
@@ -1,4 +1,3 @@
-
 import os, json
 from bl.file import File
 
@@ -14,7 +13,11 @@ class JSON(File):
 			if type(self.data)==str:
 				self.data = json.loads(self.data)
 
-	def write(self, fn=None, data=None, indent=2):
+	def write(self, fn=None, data=None, indent=2, compact=False, **args):
+		"""write the data (or self.data) as JSON; args (atomic, fsync, ...) are as for File.write().
+			indent=2		= the indentation, as for json.dumps(); None puts it all on one line
+			compact=False	= if True, write the smallest JSON: one line, no spaces after separators
+		"""
 		fn = fn or self.fn
 		data = data or self.data
 		if type(data) == bytes:
@@ -22,5 +25,136 @@ class JSON(File):
 		elif type(data) == str:
 			d = data.encode('utf-8')
 		else:
-			d = json.dumps(data, indent=2).encode('utf-8')
-		super().write(fn=fn, data=d)
+			d = self.dumps(data, indent=indent, compact=compact).encode('utf-8')
+		super().write(fn=fn, data=d, **args)
+
+	@classmethod
+	def dumps(C, data, indent=2, compact=False):
+		if compact==True:
+			return json.dumps(data, separators=(',', ':'))
+		return json.dumps(data, indent=indent)
+
+	@classmethod
+	def iter_array(C, fn, size=None, encoding='utf-8'):
+		"""yield the elements of the top-level array in the JSON file at fn, one at a time, reading
+		the file in chunks (of File.CHUNK_SIZE characters by default), so that a huge array can be
+		processed without loading it all.
+		"""
+		decoder = json.JSONDecoder()
+		size = size or C.CHUNK_SIZE
+		with open(fn, 'r', encoding=encoding) as f:
+			buffer, pos, eof = '', 0, False
+			expect = '['	# then 'value or ]', then alternately ', or ]' and 'value', then 'end'
+			while True:
+				# skip whitespace; find the start of the next token
+				while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+					pos += 1
+				if pos == len(buffer) and not eof:
+					chunk = f.read(size)
+					buffer, pos, eof = buffer[pos:] + chunk, 0, chunk == ''
+					continue
+				c = buffer[pos:pos+1]
+				if expect == '[':
+					if c != '[':
+						raise ValueError("%s does not contain a JSON array" % fn)
+					expect, pos = 'value or ]', pos + 1
+					continue
+				if expect == 'end':
+					if c != '':
+						raise ValueError("extra data after the JSON array in %s" % fn)
+					return
+				if c == '':
+					raise ValueError("unterminated JSON array in %s" % fn)
+				if c == ']' and expect in ['value or ]', ', or ]']:
+					expect, pos = 'end', pos + 1
+					continue
+				if expect == ', or ]' and c == ',':
+					expect, pos = 'value', pos + 1
+					continue
+				if expect == ', or ]' or c in ',]':
+					raise ValueError("invalid JSON array in %s at %r" % (fn, buffer[pos:pos+20]))
+				try:
+					value, end = decoder.raw_decode(buffer, pos)
+					after = end
+					while after < len(buffer) and buffer[after] in ' \t\r\n':
+						after += 1
+				except json.JSONDecodeError:
+					end = after = None	# the value is incomplete, or invalid
+				if after is None or after == len(buffer) or buffer[after] not in ',]':
+					if eof:
+						if end is None:
+							decoder.raw_decode(buffer, pos)	# raise the error
+						raise ValueError("invalid JSON array in %s at %r" % (fn, buffer[pos:pos+20]))
+					# read more: the value (such as a number) might continue in the next chunk
+					chunk = f.read(size)
+					buffer, pos, eof = buffer[pos:] + chunk, 0, chunk == ''
+					continue
+				yield value
+				expect, pos = ', or ]', after
+
+
+class JSONLines(File):
+	"""a JSON Lines file: one JSON value (a record) per line. The records are not loaded when it 
+	is created, but read lazily with records(); append() adds a record to the end of the file 
+	without reading or rewriting it, so that logs can grow indefinitely:
+
+		events = JSONLines(fn='/var/log/events.jsonl')
+		events.append({'event': 'start', 'time': time.time()})
+		for record in events.records():
+			...
+	"""
+
+	def records(self):
+		"""yield the records in the file, one at a time (skipping blank lines)"""
+		for line in self.iter_lines(mode='rb'):
+			if line.strip() != b'':
+				yield json.loads(line)
+
+	def count(self):
+		"""the number of records in the file"""
+		return sum(1 for line in self.iter_lines(mode='rb') if line.strip() != b'')
+
+	def append(self, record, fsync=False):
+		"""append the record to the file"""
+		self.extend([record], fsync=fsync)
+
+	def extend(self, records, fsync=False):
+		"""append the records to the file, writing about File.CHUNK_SIZE at a time"""
+		dirpath = os.path.dirname(self.fn)
+		if dirpath != '' and not os.path.exists(dirpath):
+			os.makedirs(dirpath)
+		with open(self.fn, 'ab') as f:
+			for chunk in self.iter_encoded(records):
+				f.write(chunk)
+			if fsync == True:
+				f.flush()
+				os.fsync(f.fileno())
+
+	def write(self, fn=None, records=None, **args):
+		"""write the records (an iterable; by default, the records in self.fn) to fn or self.fn, 
+		as they are produced; args (atomic, fsync, ...) are as for File.write(). Rewriting the 
+		file in place (e.g., from its own records, filtered) is always atomic, so that the records
+		can be read from the file while the new one is written.
+		"""
+		outfn = fn or self.fn
+		if records is None:
+			if outfn == self.fn:
+				return
+			records = self.records()
+		if os.path.abspath(outfn) == os.path.abspath(self.fn):
+			args['atomic'] = True
+		File.write(self, fn=outfn, data=self.iter_encoded(records), **args)
+
+	@classmethod
+	def iter_encoded(C, records):
+		"""yield the records as compact JSON lines, encoded, in chunks of about File.CHUNK_SIZE"""
+		lines, size = [], 0
+		for record in records:
+			line = json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+			lines.append(line + b'\n')
+			size += len(line) + 1
+			if size >= C.CHUNK_SIZE:
+				yield b''.join(lines)
+				lines, size = [], 0
+		if len(lines) > 0:
+			yield b''.join(lines)
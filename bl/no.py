@@ -2,6 +2,17 @@ import json
 
 
 class No:
+    """the falsy value of a missing key in a NoDict, which is also No at any key or attribute.
+    There is only one No, so that digging through missing levels doesn't allocate.
+    """
+
+    def __new__(C):
+        instance = C.__dict__.get('instance')
+        if instance is None:
+            instance = object.__new__(C)
+            setattr(C, 'instance', instance)
+        return instance
+
     def __bool__(self):
         return False
 
@@ -12,10 +23,10 @@ class No:
         return ''
 
     def __getattr__(self, key):
-        return No()
+        return self
 
     def __getitem__(self, key):
-        return No()
+        return self
 
 
 class NoDict(dict):
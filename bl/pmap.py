@@ -0,0 +1,295 @@
+"""
+Persistent (immutable) mappings with the Dict and NoDict APIs, stored in a hash array mapped trie
+(HAMT). Deriving a new mapping with a few changes -- pmap(key=val) -- copies only the path to
+each changed key, O(log n), and shares the rest of the trie with the original, so that per-request
+overlays of a large configuration cost almost nothing:
+
+    base = PMap(db={'host': 'localhost', 'port': 5432}, debug=False)
+    request_config = base(debug=True)           # base is unchanged
+    request_config.db.port                      # 5432 (nested dicts become PMaps)
+
+Dict and NoDict are dict subclasses, so their storage is the built-in dict; PMap and PNoDict are
+the persistent counterparts, with the same dot access, derivation by calling, and sorted keys().
+They are immutable: set() and delete() return new mappings.
+"""
+
+import json
+from collections.abc import Mapping
+from bl.dict import Dict
+from bl.no import No, NoDict
+
+BITS = 5
+MASK = (1 << BITS) - 1
+HASH_BITS = 64
+
+
+def bit_count(n):
+    return bin(n).count('1')
+
+
+class Node:
+    """a trie node: the bitmap says which of the 32 slots are used, and entries holds a
+    (key, value) tuple or a sub-Node for each used slot, in slot order"""
+
+    __slots__ = ('bitmap', 'entries')
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class Collision:
+    """a leaf holding the (key, value) entries whose keys have the same full hash"""
+
+    __slots__ = ('hash', 'entries')
+
+    def __init__(self, hash, entries):
+        self.hash = hash
+        self.entries = entries
+
+
+EMPTY = Node(0, ())
+
+
+def key_hash(key):
+    return hash(key) & ((1 << HASH_BITS) - 1)
+
+
+def lookup(node, h, key):
+    """return the (key, value) entry for key in the trie, or None"""
+    shift = 0
+    while True:
+        if isinstance(node, Collision):
+            for entry in node.entries:
+                if entry[0] == key:
+                    return entry
+            return None
+        bit = 1 << ((h >> shift) & MASK)
+        if not node.bitmap & bit:
+            return None
+        entry = node.entries[bit_count(node.bitmap & (bit - 1))]
+        if isinstance(entry, tuple):
+            return entry if entry[0] == key else None
+        node, shift = entry, shift + BITS
+
+
+def assoc(node, h, shift, key, val):
+    """return (the trie with key set to val, whether the key was added)"""
+    if isinstance(node, Collision):
+        for i, entry in enumerate(node.entries):
+            if entry[0] == key:
+                entries = node.entries[:i] + ((key, val),) + node.entries[i + 1 :]
+                return Collision(h, entries), False
+        return Collision(h, node.entries + ((key, val),)), True
+    bit = 1 << ((h >> shift) & MASK)
+    i = bit_count(node.bitmap & (bit - 1))
+    if not node.bitmap & bit:
+        entries = node.entries[:i] + ((key, val),) + node.entries[i:]
+        return Node(node.bitmap | bit, entries), True
+    entry = node.entries[i]
+    if isinstance(entry, tuple):
+        if entry[0] == key:
+            if entry[1] is val:
+                return node, False
+            new_entry, added = (key, val), False
+        else:
+            new_entry, added = pair(entry, key_hash(entry[0]), (key, val), h, shift + BITS), True
+    else:
+        new_entry, added = assoc(entry, h, shift + BITS, key, val)
+        if new_entry is entry:
+            return node, False
+    return Node(node.bitmap, node.entries[:i] + (new_entry,) + node.entries[i + 1 :]), added
+
+
+def pair(entry1, h1, entry2, h2, shift):
+    """a sub-trie holding the two entries, whose hashes agree below shift"""
+    if shift >= HASH_BITS:
+        return Collision(h1, (entry1, entry2))
+    i1, i2 = (h1 >> shift) & MASK, (h2 >> shift) & MASK
+    if i1 == i2:
+        return Node(1 << i1, (pair(entry1, h1, entry2, h2, shift + BITS),))
+    entries = (entry1, entry2) if i1 < i2 else (entry2, entry1)
+    return Node((1 << i1) | (1 << i2), entries)
+
+
+def dissoc(node, h, shift, key):
+    """return the trie without key (the same node if the key isn't there; None if empty)"""
+    if isinstance(node, Collision):
+        entries = tuple(entry for entry in node.entries if entry[0] != key)
+        if len(entries) == len(node.entries):
+            return node
+        if len(entries) == 1:
+            return entries[0]  # collapse into the parent as a plain entry
+        return Collision(node.hash, entries)
+    bit = 1 << ((h >> shift) & MASK)
+    if not node.bitmap & bit:
+        return node
+    i = bit_count(node.bitmap & (bit - 1))
+    entry = node.entries[i]
+    if isinstance(entry, tuple):
+        if entry[0] != key:
+            return node
+        new_entry = None
+    else:
+        new_entry = dissoc(entry, h, shift + BITS, key)
+        if new_entry is entry:
+            return node
+        if isinstance(new_entry, Node) and len(new_entry.entries) == 1:
+            if isinstance(new_entry.entries[0], tuple):
+                new_entry = new_entry.entries[0]  # a single entry moves up
+    if new_entry is None:
+        if node.bitmap == bit:
+            return None
+        return Node(node.bitmap & ~bit, node.entries[:i] + node.entries[i + 1 :])
+    return Node(node.bitmap, node.entries[:i] + (new_entry,) + node.entries[i + 1 :])
+
+
+def iter_entries(node):
+    for entry in node.entries:
+        if isinstance(entry, tuple):
+            yield entry
+        else:
+            yield from iter_entries(entry)
+
+
+class PMap(Mapping):
+    """a persistent mapping with the Dict API: dot access (None for a missing key), sorted keys()
+    and values(), and calling to derive a new mapping with changes, which shares structure with
+    this one. Nested dicts become PMaps and lists become tuples, so the whole tree is immutable.
+    """
+
+    __slots__ = ('__root__', '__size__')
+
+    def __init__(self, *args, **kwargs):
+        root, size = EMPTY, 0
+        for key, val in dict(*args, **kwargs).items():
+            root, added = assoc(root, key_hash(key), 0, key, self.convert(val))
+            size += added
+        object.__setattr__(self, '__root__', root)
+        object.__setattr__(self, '__size__', size)
+
+    @classmethod
+    def convert(C, val):
+        """convert nested values: dicts (including Dicts) to C, lists to tuples"""
+        if isinstance(val, dict):
+            return C(val)
+        elif type(val) == list:
+            return tuple(C.convert(v) for v in val)
+        elif type(val) == bytes:
+            return val.decode('UTF-8')
+        return val
+
+    @classmethod
+    def from_root(C, root, size):
+        m = C.__new__(C)
+        object.__setattr__(m, '__root__', root or EMPTY)
+        object.__setattr__(m, '__size__', size)
+        return m
+
+    def __call__(self, *args, **kwargs):
+        """return a new mapping with the given keys set, sharing structure with this one"""
+        root, size = self.__root__, self.__size__
+        for key, val in dict(*args, **kwargs).items():
+            root, added = assoc(root, key_hash(key), 0, key, self.convert(val))
+            size += added
+        return self.from_root(root, size)
+
+    def set(self, key, val):
+        """return a new mapping with key set to val"""
+        return self({key: val})
+
+    def delete(self, key):
+        """return a new mapping without key (KeyError if it isn't there)"""
+        root = dissoc(self.__root__, key_hash(key), 0, key)
+        if root is self.__root__:
+            raise KeyError(key)
+        return self.from_root(root, self.__size__ - 1)
+
+    def __getitem__(self, key):
+        entry = lookup(self.__root__, key_hash(key), key)
+        if entry is None:
+            return self.__missing__(key)
+        return entry[1]
+
+    def __missing__(self, key):
+        raise KeyError(key)
+
+    def __getattr__(self, name):
+        entry = lookup(self.__root__, key_hash(name), name)
+        if entry is not None:
+            return entry[1]
+
+    def __setattr__(self, name, val):
+        raise TypeError("%s is immutable; use set() or call it to derive a new one" % (
+            self.__class__.__name__))
+
+    __setitem__ = __delattr__ = __delitem__ = __setattr__
+
+    def __contains__(self, key):
+        return lookup(self.__root__, key_hash(key), key) is not None
+
+    def get(self, key, default=None):
+        entry = lookup(self.__root__, key_hash(key), key)
+        return default if entry is None else entry[1]
+
+    def __len__(self):
+        return self.__size__
+
+    def __iter__(self):
+        for key, val in iter_entries(self.__root__):
+            yield key
+
+    def __hash__(self):
+        return hash(frozenset(iter_entries(self.__root__)))
+
+    def __reduce__(self):
+        return (self.__class__, (dict(iter_entries(self.__root__)),))
+
+    def __repr__(self):
+        return "%s({%s})" % (
+            self.__class__.__name__,
+            ", ".join("%r: %r" % (k, self[k]) for k in self.keys()),
+        )
+
+    def keys(self, key=None, reverse=False):
+        """the sorted keys"""
+        return sorted(self, key=key, reverse=reverse)
+
+    def values(self, key=None, reverse=False):
+        """the values in the same order as the keys"""
+        return [self[k] for k in self.keys(key=key, reverse=reverse)]
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def to_dict(self, Class=Dict):
+        """convert to a Dict (or other dict Class), recursively"""
+
+        def plain(val):
+            if isinstance(val, PMap):
+                return val.to_dict(Class=Class)
+            elif type(val) == tuple:
+                return [plain(v) for v in val]
+            return val
+
+        return Class(**{k: plain(v) for k, v in iter_entries(self.__root__)})
+
+    def json(self, **params):
+        return json.dumps(self.to_dict(Class=dict), **params)
+
+
+class PNoDict(PMap):
+    """a persistent mapping with the NoDict API: a missing key (by attribute or item) is No"""
+
+    __slots__ = ()
+
+    def __missing__(self, key):
+        return No()
+
+    def __getattr__(self, name):
+        if name[:2] == '__' and name[-2:] == '__':
+            raise AttributeError(name)  # for copy, pickle, etc.
+        return self[name]
+
+    def to_dict(self, Class=NoDict):
+        return PMap.to_dict(self, Class=Class)
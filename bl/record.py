@@ -0,0 +1,165 @@
+"""
+Record types: classes with a fixed list of fields, generated once from the field names, whose
+instances store their values in __slots__ rather than in a dict of their own, so that they take a
+fraction of the memory of a Dict. They keep the Dict ergonomics: dot and item access, None for a
+field that has not been set, calling to make a copy with changes, sorted keys(), and json().
+They convert to and from Dicts without loss:
+
+    Point = record_type('Point', 'x y label')
+    p = Point(x=1, y=2)
+    p.x, p.label                    # (1, None)
+    q = p(label='origin')           # a new Point; p is unchanged
+    q.to_dict()                     # {'label': 'origin', 'x': 1, 'y': 2}
+    Point.from_dict(Dict(x=1, y=2)) == p
+"""
+
+import json, keyword, sys
+from bl.dict import Dict
+
+
+class Record:
+    """the base class of record types (see record_type()). Only the fields that have been set
+    are keys; the others are None by attribute, missing by item, and not included in to_dict().
+    """
+
+    __slots__ = ()
+    FIELDS = ()  # the field names, in the order of the positional arguments
+    KEYS = ()  # the field names, sorted
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(self.FIELDS):
+            raise TypeError(
+                "%s takes at most %d values (%d given)"
+                % (self.__class__.__name__, len(self.FIELDS), len(args))
+            )
+        for field, val in zip(self.FIELDS, args):
+            object.__setattr__(self, field, val)
+        for key, val in kwargs.items():
+            self[key] = val
+
+    def __getattr__(self, name):
+        # only called for fields that have not been set, and for names that aren't fields
+        if name[:2] == '__' and name[-2:] == '__':
+            raise AttributeError(name)
+        return None
+
+    def __getitem__(self, key):
+        if key in self.KEYS:
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, val):
+        if key not in self.KEYS:
+            raise KeyError("%s has no field %r" % (self.__class__.__name__, key))
+        object.__setattr__(self, key, val)
+
+    def __delitem__(self, key):
+        try:
+            object.__delattr__(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.KEYS and self.is_set(key)
+
+    def is_set(self, field):
+        try:
+            object.__getattribute__(self, field)
+            return True
+        except AttributeError:
+            return False
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self.__class__ == other.__class__ and self.items() == other.items()
+        elif isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            self.__class__.__name__, ", ".join("%s=%r" % item for item in self.items())
+        )
+
+    def __call__(self, **kwargs):
+        """return a copy of this record with the given fields set"""
+        r = self.__class__.__new__(self.__class__)
+        for key, val in self.items():
+            object.__setattr__(r, key, val)
+        for key, val in kwargs.items():
+            r[key] = val
+        return r
+
+    def __getstate__(self):
+        return dict(self.items())
+
+    def __setstate__(self, state):
+        for key, val in state.items():
+            object.__setattr__(self, key, val)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        """the sorted names of the fields that have been set"""
+        return [key for key in self.KEYS if self.is_set(key)]
+
+    def values(self):
+        """the values in the same order as the keys"""
+        return [getattr(self, key) for key in self.keys()]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def to_dict(self, Class=Dict):
+        """the fields that have been set, as a Dict (or other dict Class)"""
+        d = Class()
+        for key, val in self.items():
+            d[key] = val
+        return d
+
+    @classmethod
+    def from_dict(C, d):
+        """a record with the fields in the given dict; KeyError for a key that is not a field"""
+        r = C.__new__(C)
+        for key, val in d.items():
+            r[key] = val
+        return r
+
+    def json(self, **params):
+        return json.dumps(dict(self.items()), **params)
+
+
+def record_type(name, fields, module=None):
+    """create a Record subclass with the given name and fields (a list of names, or a string of
+    names separated by spaces or commas). module = the name of the module that the class is in,
+    for pickling (by default, the caller's module).
+    """
+    if isinstance(fields, str):
+        fields = fields.replace(',', ' ').split()
+    fields = tuple(fields)
+    for field in fields:
+        if not field.isidentifier() or keyword.iskeyword(field) or field[:1] == '_':
+            raise ValueError("invalid field name: %r" % field)
+        if hasattr(Record, field):
+            raise ValueError("field name conflicts with a Record method: %r" % field)
+    if len(set(fields)) != len(fields):
+        raise ValueError("duplicate field names: %r" % (fields,))
+    if module is None:
+        module = sys._getframe(1).f_globals.get('__name__', '__main__')
+    return type(
+        name,
+        (Record,),
+        {'__slots__': fields, 'FIELDS': fields, 'KEYS': tuple(sorted(fields)), '__module__': module},
+    )
@@ -1,35 +1,234 @@
-
 import logging
 log = logging.getLogger(__name__)
 
-import os
-from glob import glob
-try:
-    from glob import escape
-except:                                                 # support Python < 3.4
-    import re
-    magic_check = re.compile('([*?[])')
-    def escape(s):
-        drive, pathname = os.path.splitdrive(s)
-        pathname = magic_check.sub(r'[\1]', pathname)
-        return drive + pathname
-
-def rglob(dirname, pattern, dirs=False, sort=True):
+import os, re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import translate
+from queue import Queue
+from bl.dict import OrderedDict
+
+# directories that rarely need to be searched, for use with prune=
+SKIP_DIRS = ['.git', '.hg', '.svn', '__pycache__', 'node_modules']
+
+def rglob(dirname, pattern, dirs=False, sort=True, **kwargs):
     """recursive glob, gets all files that match the pattern within the directory tree"""
-    fns = []
+    fns = list(irglob(dirname, pattern, dirs=dirs, **kwargs))
+    if sort==True:
+        fns.sort()
+    return fns
+
+def irglob(dirname, pattern, dirs=False, entries=False, **kwargs):
+    """recursive glob generator, yields the paths that match the pattern within the directory tree
+    as they are found. Each directory is listed once with os.scandir(), and the cached entry types
+    are used to find the subdirectories, so no additional stat calls are needed.
+        dirname     = the top of the directory tree
+        pattern     = a glob pattern, matched (like glob.glob()) against the end of each path
+        dirs=False  = if True, also yield all directories, whether or not they match the pattern
+        entries=False = if True, yield the os.DirEntry of each match rather than its path
+        **kwargs    = exclude, prune, workers, ordered, depth, follow_symlinks: see walk()
+    As with the recursive glob this replaces, symlinks to directories are followed (with or 
+    without workers), so a link to an enclosing directory fails with OSError (too many levels of
+    symbolic links); pass follow_symlinks=False to list such links without walking them.
+    """
     path = str(dirname)
-    if os.path.isdir(path):
-        fns = glob(os.path.join(escape(path), pattern))
-        dns = [fn for fn 
-                in [os.path.join(path, fn)
-                    for fn in os.listdir(path)] 
-                if os.path.isdir(fn)]
-        if dirs==True:
-            fns += dns
-        for d in dns:
-            fns += rglob(d, pattern)
-        if sort==True:
+    match = compile_pattern(pattern, path)
+    for entry in walk(path, **kwargs):
+        if (dirs==True and entry.is_dir()) or match(entry):
+            yield entry if entries == True else entry.path
+
+def rglob_many(dirname, patterns, dirs=False, sort=True, **kwargs):
+    """recursive glob for several patterns in a single pass through the directory tree. Returns
+    an OrderedDict with the given patterns as keys (in order) and the lists of matching paths as
+    values. Patterns are glob patterns or compiled regexes (which are searched in the basename).
+    >>> rglob_many('/nonexistent', ['*.txt', re.compile('^~')])
+    OrderedDict([('*.txt', []), (re.compile('^~'), [])])
+    """
+    results = OrderedDict([(pattern, []) for pattern in patterns])
+    for pattern, fn in irglob_many(dirname, patterns, dirs=dirs, **kwargs):
+        results[pattern].append(fn)
+    if sort==True:
+        for fns in results.values():
             fns.sort()
+    return results
+
+def irglob_many(dirname, patterns, dirs=False, **kwargs):
+    """recursive glob generator for several patterns, yields (pattern, path) for every pattern
+    that each path matches, in a single pass through the directory tree. Parameters as irglob().
+    """
+    path = str(dirname)
+    matches = [(pattern, compile_pattern(pattern, path)) for pattern in patterns]
+    for entry in walk(path, **kwargs):
+        isdir = dirs==True and entry.is_dir()
+        for pattern, match in matches:
+            if isdir or match(entry):
+                yield pattern, entry.path
+
+def walk(
+    dirname, exclude=None, prune=None, workers=None, ordered=False, depth=None, 
+    follow_symlinks=True, stat=False
+):
+    """yield the os.DirEntry of each file and directory in the directory tree, not including the
+    top directory.
+        exclude         = names (glob patterns or compiled regexes) of entries to omit
+        prune           = names (glob patterns or compiled regexes) of directories not to descend
+                            into (or yield)
+        workers=None    = if given, list the directories in parallel in a pool of this many 
+                            threads, which is much faster on high-latency (network) filesystems
+        ordered=False   = if True with workers, yield the entries in a deterministic order: the
+                            directories in the order they are found, their entries sorted by name
+        depth=None      = if given, the number of levels below the top directory to walk
+        follow_symlinks = whether to treat symlinks to directories as directories and walk them
+        stat=False      = if True, call entry.stat() while listing (in the worker threads), so
+                            that the stat of each entry is cached when it is yielded
+    """
+    path = str(dirname)
+    if not os.path.isdir(path):
+        log.warning("not a directory: %r" % path)
+        return
+    excluded = compile_names(exclude)
+    for entries in scantree(
+        path, workers=workers, ordered=ordered, depth=depth, 
+        pruned=compile_names(prune), follow_symlinks=follow_symlinks, stat=stat
+    ):
+        for entry in entries:
+            if excluded is None or not excluded(entry.name):
+                yield entry
+
+def scantree(path, workers=None, ordered=False, depth=None, follow_symlinks=True, **options):
+    """yield the list of entries in each directory of the tree below path (see walk()).
+    options are passed to scandir().
+    """
+    options['follow_symlinks'] = follow_symlinks
+    if not workers:
+        stack = [(path, 1)]
+        while len(stack) > 0:
+            dirpath, level = stack.pop()
+            entries = scandir(dirpath, **options)
+            yield entries
+            if depth is None or level < depth:
+                stack += [
+                    (entry.path, level + 1) for entry in entries 
+                    if entry.is_dir(follow_symlinks=follow_symlinks)
+                ]
+        return
+
+    # Listing directories is mostly waiting on the filesystem, so a pool of threads can list 
+    # many directories at once. Each directory is queued for listing as soon as it is found.
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = deque() if ordered==True else Queue()
+    futures = set()
+    def submit(dirpath, level):
+        future = pool.submit(scandir, dirpath, sort=ordered, **options)
+        future.level = level
+        futures.add(future)
+        if ordered==True:
+            pending.append(future)
+        else:
+            future.add_done_callback(pending.put)
+    submit(path, 1)
+    try:
+        while len(futures) > 0:
+            future = pending.popleft() if ordered==True else pending.get()
+            futures.remove(future)
+            entries = future.result()
+            if depth is None or future.level < depth:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        submit(entry.path, future.level + 1)
+            yield entries
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+def scandir(path, pruned=None, sort=False, follow_symlinks=True, stat=False):
+    """return the list of os.DirEntry objects in the given directory, omitting directories with 
+    names matching pruned, optionally sorted by name. The type (and if stat=True, the stat) of 
+    each entry is resolved here, so that when listing in parallel, any stat call that is needed 
+    happens in the worker thread.
+    """
+    with os.scandir(path) as entries:
+        entries = [
+            entry for entry in entries
+            if not (
+                entry.is_dir(follow_symlinks=follow_symlinks) 
+                and pruned is not None and pruned(entry.name)
+            )
+        ]
+    if stat==True:
+        for entry in entries:
+            try:
+                entry.stat(follow_symlinks=follow_symlinks)
+            except OSError:
+                pass    # a broken symlink, or removed; entry.stat() will raise it again
+    if sort==True:
+        entries.sort(key=lambda entry: entry.name)
+    return entries
+
+def compile_pattern(pattern, path):
+    """compile the glob pattern to a function that returns True if a DirEntry under path matches.
+    Like glob.glob(), names beginning with '.' only match a pattern that also begins with '.',
+    and a pattern with several path segments is matched against the last segments of the path.
+    A compiled regex is searched in the name.
+    """
+    match_name, match_path = compile_path_pattern(pattern, path)
+    if match_path is None:
+        return lambda entry: match_name(entry.name)
+    return lambda entry: match_name(entry.name) and match_path(entry.path)
+
+def compile_path_pattern(pattern, path):
+    """compile the pattern (see compile_pattern()) to a pair of functions (match_name, match_path), 
+    both of which must return True for a path under the given path to match. match_path is None 
+    when the name alone decides the match.
+    """
+    if not isinstance(pattern, str):
+        return (lambda name: pattern.search(name) is not None), None
+    parts = compile_segments(pattern)
+    if len(parts) == 1:
+        return parts[0], None
+    prefix = len(path.rstrip(os.sep)) + 1
+    def match_path(fn):
+        names = fn[prefix:].split(os.sep)
+        return len(names) >= len(parts) and all(
+            part(name) for part, name in zip(parts, names[-len(parts):])
+        )
+    return parts[-1], match_path
+
+def compile_segments(pattern):
+    """compile each path segment of the glob pattern to a function that matches a name"""
+    return [
+        compile_name_pattern(part)
+        for part in re.split(r'[/\\]' if os.sep=='\\' else '/', pattern)
+    ]
+
+def compile_names(patterns):
+    """compile a list of glob patterns and/or compiled regexes to a single function that returns
+    True if a name matches any of them, or None if there are no patterns.
+    """
+    if patterns is None or len(patterns) == 0:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    matchers = [
+        (lambda name, regex=p: regex.search(name) is not None)
+        for p in patterns if not isinstance(p, str)
+    ]
+    globs = [translate(os.path.normcase(p)) for p in patterns if isinstance(p, str)]
+    if len(globs) > 0:
+        matchers.insert(0, compile_name_pattern('|'.join(globs), translated=True, hidden=True))
+    if len(matchers) == 1:
+        return matchers[0]
+    return lambda name: any(match(name) for match in matchers)
+
+def compile_name_pattern(pattern, translated=False, hidden=None):
+    """compile the glob pattern for a single path segment to a function that matches a name"""
+    regex = re.compile(pattern if translated else translate(os.path.normcase(pattern)))
+    if hidden is None:
+        hidden = pattern[:1]=='.'
+    if os.path.normcase('A')=='A':
+        return lambda name: (hidden or name[:1]!='.') and regex.match(name) is not None
     else:
-        log.warn("not a directory: %r" % path)
-    return fns
+        return lambda name: (
+            (hidden or name[:1]!='.') and regex.match(os.path.normcase(name)) is not None
+        )
@@ -40,18 +40,27 @@ class String(str):
             * SHA384 = 64
             * SHA512 = 86
         """
-        import base64, hashlib
+        import hashlib
 
         h = hashlib.new(alg)
         h.update(str(self).encode('utf-8'))
+        return String.format_digest(h.digest(), b64=b64, strip=strip)
+
+    @classmethod
+    def format_digest(C, digest, b64=True, strip=True):
+        """format the given digest bytes as returned by String.digest(): base64 (url-safe) if b64, 
+        without trailing '=' if strip, otherwise hex.
+        """
+        import base64
+
         if b64 == True:
             # this returns a string with a predictable amount of = padding at the end
-            b = base64.urlsafe_b64encode(h.digest()).decode('ascii')
+            b = base64.urlsafe_b64encode(digest).decode('ascii')
             if strip == True:
                 b = b.rstrip('=')
             return b
         else:
-            return h.hexdigest()
+            return digest.hex()
 
     def base64(self):
         import base64 as b64
@@ -58,7 +58,7 @@ class URL(Dict):
         self.qargs = d
         for k in qargs.keys():
             if qargs[k] in ['', None]: 
-                if k in self.qargs.keys():
+                if k in self.qargs:
                     _=self.qargs.pop(k)
             else:
                 self.qargs[k] = qargs[k]
@@ -126,9 +126,7 @@ class URL(Dict):
 
     def drop_qarg(self, key):
         u = URL(self)
-        for k in u.qargs.keys():
-            if k == key:
-                del(u.qargs[k])
+        u.qargs.pop(key, None)
         return u
 
     def quoted(self):
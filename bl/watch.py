@@ -0,0 +1,239 @@
+"""
+Linux inotify support (via ctypes, no external dependencies), and a LiveIndex: an in-memory
+bl.dirindex.DirIndex of a directory tree that a background thread keeps up to date as files
+change. Usually used through bl.folder.Folder.watch():
+
+    folder = Folder('/data/assets')
+    folder.watch()
+    folder.rglob('*.jpg')           # served from memory
+    folder.unwatch()
+"""
+
+import ctypes, ctypes.util, logging, os, select, struct, threading, time
+from bl.dirindex import DirIndex, DIR
+from bl.rglob import compile_names
+
+log = logging.getLogger(__name__)
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# the events that change a directory listing or the size/mtime of its entries
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class Inotify:
+    """a minimal wrapper around the Linux inotify API"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        try:
+            self.libc_add_watch = libc.inotify_add_watch
+            self.libc_rm_watch = libc.inotify_rm_watch
+            init = libc.inotify_init1
+        except AttributeError:
+            raise OSError("inotify is not available on this system")
+        self.libc_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.libc_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = init(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """watch the directory at path, returning the watch descriptor"""
+        wd = self.libc_add_watch(self.fd, os.fsencode(path), mask | IN_ONLYDIR)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self.libc_rm_watch(self.fd, wd)
+
+    def read(self, timeout=None):
+        """return a list of the pending events as (wd, mask, cookie, name) tuples, waiting up to
+        timeout seconds (forever if None) for the first event.
+        """
+        if len(select.select([self.fd], [], [], timeout)[0]) == 0:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        i = 0
+        while i < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, i)
+            i += EVENT_HEADER.size
+            name = os.fsdecode(data[i : i + length].rstrip(b'\0'))
+            i += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class LiveIndex(DirIndex):
+    """an in-memory DirIndex of the tree at root that is kept up to date by a background thread.
+    Each event marks its directory for relisting; the events that arrive within `latency` seconds
+    of each other are applied together, so a burst of changes costs one listing per directory.
+        root            = the top of the directory tree
+        latency=0.05    = how long to wait for more events before applying changes
+        prune=None      = names (glob patterns or compiled regexes) of directories to skip
+    """
+
+    def __init__(self, root=None, latency=0.05, prune=None, **args):
+        DirIndex.__init__(self, root=root, **args)
+        self.__dict__['latency'] = latency
+        self.__dict__['pruned'] = compile_names(prune)
+        self.__dict__['lock'] = threading.RLock()
+        self.__dict__['inotify'] = None
+        self.__dict__['thread'] = None
+        self.__dict__['wds'] = {}  # wd -> reldir
+        self.__dict__['reldir_wds'] = {}  # reldir -> wd
+
+    def __repr__(self):
+        return "%s(root=%r)" % (self.__class__.__name__, self.root)
+
+    def start(self):
+        """index the tree and start watching it; returns self"""
+        self.__dict__['inotify'] = Inotify()
+        with self.lock:
+            self.dirs = {}
+            self.add('')
+        self.__dict__['thread'] = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """stop watching the tree; the index is no longer updated"""
+        thread, self.__dict__['thread'] = self.thread, None
+        if thread is not None:
+            thread.join()
+        if self.inotify is not None:
+            self.inotify.close()
+            self.__dict__['inotify'] = None
+        self.wds.clear()
+        self.reldir_wds.clear()
+
+    def run(self):
+        while self.thread is not None:
+            events = self.inotify.read(timeout=0.5)
+            if len(events) == 0:
+                continue
+            # gather the events in this burst (up to 1 s), then apply them together
+            t = time.time()
+            while time.time() - t < 1:
+                more = self.inotify.read(timeout=self.latency)
+                if len(more) == 0:
+                    break
+                events += more
+            try:
+                self.apply(events)
+            except:
+                log.exception("error updating %r" % self)
+
+    def apply(self, events):
+        """update the index with the given inotify events"""
+        with self.lock:
+            if any(mask & IN_Q_OVERFLOW for wd, mask, cookie, name in events):
+                log.warning("inotify queue overflow, rescanning %r" % self.root)
+                for wd in list(self.wds):
+                    self.inotify.rm_watch(wd)
+                self.wds.clear()
+                self.reldir_wds.clear()
+                self.dirs = {}
+                self.add('')
+                return
+            dirty = set()
+            for wd, mask, cookie, name in events:
+                reldir = self.wds.get(wd)
+                if mask & IN_IGNORED:
+                    self.wds.pop(wd, None)
+                elif reldir is not None and reldir in self.dirs:
+                    dirty.add(reldir)
+            for reldir in sorted(dirty):  # parents before children
+                if reldir in self.dirs:
+                    self.relist(reldir)
+
+    def add(self, reldir):
+        """watch and index the directory at reldir and its subdirectories"""
+        stack = [reldir]
+        while len(stack) > 0:
+            reldir = stack.pop()
+            dirpath = os.path.join(self.root, reldir)
+            try:
+                # watch before listing, so that no change after the listing is missed
+                wd = self.inotify.add_watch(dirpath)
+                st = os.stat(dirpath)
+                entries = self.list(dirpath, pruned=self.pruned)
+            except OSError:
+                log.debug("could not index %r" % dirpath)  # removed in the meantime
+                continue
+            self.wds[wd] = reldir
+            self.reldir_wds[reldir] = wd
+            self.dirs[reldir] = (st.st_mtime_ns, st.st_ino, entries)
+            stack += [os.path.join(reldir, e.name) for e in entries if e.type == DIR]
+
+    def remove(self, reldir):
+        """stop watching and drop the directory at reldir and its subdirectories from the index"""
+        stack = [reldir]
+        while len(stack) > 0:
+            reldir = stack.pop()
+            wd = self.reldir_wds.pop(reldir, None)
+            if wd is not None and self.wds.get(wd) == reldir:  # the wd may have moved
+                del self.wds[wd]
+                self.inotify.rm_watch(wd)
+            d = self.dirs.pop(reldir, None)
+            if d is not None:
+                stack += [os.path.join(reldir, e.name) for e in d[2] if e.type == DIR]
+
+    def relist(self, reldir):
+        """relist the directory at reldir, adding and removing subdirectories as needed"""
+        dirpath = os.path.join(self.root, reldir)
+        old_dirs = {(e.name, e.ino) for e in self.dirs[reldir][2] if e.type == DIR}
+        try:
+            st = os.stat(dirpath)
+            entries = self.list(dirpath, pruned=self.pruned)
+        except OSError:
+            self.remove(reldir)  # its parent will be relisted too
+            return
+        self.dirs[reldir] = (st.st_mtime_ns, st.st_ino, entries)
+        new_dirs = {(e.name, e.ino) for e in entries if e.type == DIR}
+        for name, ino in old_dirs - new_dirs:
+            self.remove(os.path.join(reldir, name))
+        for name, ino in new_dirs - old_dirs:
+            self.add(os.path.join(reldir, name))
+
+    def ientries(self, *args, **kwargs):
+        with self.lock:
+            entries = list(DirIndex.ientries(self, *args, **kwargs))
+        return iter(entries)
+
+    def iglob(self, *args, **kwargs):
+        with self.lock:
+            entries = list(DirIndex.iglob(self, *args, **kwargs))
+        return iter(entries)
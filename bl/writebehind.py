@@ -0,0 +1,87 @@
+import logging, sys, threading
+from queue import Queue, Empty
+
+log = logging.getLogger(__name__)
+
+
+class WriteBehind:
+    """a write-behind queue: writes are queued and performed in batches on a background thread,
+    so that the producers are not blocked on disk latency. Any File (or Text, JSON, Config, ...)
+    can be written through it, with the same arguments as its own write() method:
+
+        with WriteBehind(atomic=True) as wb:
+            for record in records:
+                wb.write(JSON(fn=record.fn), data=record.data)
+        # all the writes have been done here
+
+    Within a batch, a write is skipped if a later write in the same batch replaces the same file.
+    Pass the data to write() rather than relying on file.data, which may change before the
+    write happens.
+        maxsize=1000    = the most writes that can be queued before write() blocks (0 = no limit)
+        batch=100       = the most writes that are taken from the queue at once
+        **params        = default parameters for each write (e.g., atomic=True)
+    """
+
+    def __init__(self, maxsize=1000, batch=100, **params):
+        self.queue = Queue(maxsize=maxsize)
+        self.batch = batch
+        self.params = params
+        self.errors = []  # the (file, params, exception) of each write that failed
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, file, **params):
+        """queue file.write(**params)"""
+        if self.thread is None:
+            raise ValueError("write to closed WriteBehind")
+        self.queue.put((file, dict(self.params, **params)))
+
+    def flush(self):
+        """wait until all the queued writes are done"""
+        self.queue.join()
+
+    def close(self):
+        """do all the queued writes and stop the background thread"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        done = False
+        while not done:
+            items = [self.queue.get()]
+            try:
+                while len(items) < self.batch:
+                    items.append(self.queue.get_nowait())
+            except Empty:
+                pass
+            done = None in items
+            for file, params in self.supersede([item for item in items if item is not None]):
+                try:
+                    file.write(**params)
+                except:
+                    log.error("write failed: %r: %s" % (file, sys.exc_info()[1]))
+                    self.errors.append((file, params, sys.exc_info()[1]))
+            for item in items:
+                self.queue.task_done()
+
+    @classmethod
+    def supersede(C, items):
+        """omit the writes that are replaced by a later (non-appending) write to the same file"""
+        replaced = set()
+        result = []
+        for file, params in reversed(items):
+            fn = str(params.get('fn') or file.fn)
+            if fn in replaced:
+                continue
+            if 'a' not in params.get('mode', 'w'):
+                replaced.add(fn)
+            result.append((file, params))
+        return list(reversed(result))
@@ -0,0 +1,24 @@
+import asyncio
+import pytest
+from bl import aio
+from bl.file import File
+
+
+def test_aio(tmp_path):
+    fn = str(tmp_path / 'a.txt')
+
+    async def main():
+        text = await aio.AsyncText.load(fn)
+        text.text = 'hello'
+        await text.write(atomic=True)
+        assert (await aio.AsyncText.load(fn)).text == 'hello'
+        f = aio.AsyncFile(File(fn))
+        assert [c async for c in f.iter_chunks(size=2)] == [b'he', b'll', b'o']
+        await aio.AsyncJSON(aio.JSON(fn=str(tmp_path / 'b.json'), data={'a': 1})).write()
+        assert (await aio.AsyncJSON.load(str(tmp_path / 'b.json'))).data == {'a': 1}
+        results = await asyncio.gather(*[f.read() for i in range(100)])
+        assert results == [b'hello'] * 100
+        assert [p async for p in aio.irglob(str(tmp_path), '*.*', batch=1)] != []
+        assert len(await aio.rglob(str(tmp_path), '*.*')) == 2
+
+    asyncio.run(main())
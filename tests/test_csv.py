@@ -1,3 +1,83 @@
+import os
 import pytest
 from bl import csv
 
+
+
+def test_iter_csv(tmp_path):
+    fn = str(tmp_path / 'a.tsv')
+    with open(fn, 'w', newline='') as f:
+        f.write('name\tnote\nA\t"two\nlines"\n\nB\tb\textra\n')
+    rows = list(csv.iter_csv(fn))
+    assert rows == [
+        {'name': 'A', 'note': 'two\nlines'}, {'name': 'B', 'note': 'b', 'C': 'extra'}
+    ]
+    assert list(rows[1].keys()) == ['name', 'note', 'C']
+    rows = csv.load_csv(fn, headings=False)
+    assert rows[0] == {'A': 'name', 'B': 'note'} and len(rows) == 3
+
+
+def test_records_and_columns(tmp_path):
+    import datetime, math
+
+    fn = str(tmp_path / 'a.tsv')
+    with open(fn, 'w', newline='') as f:
+        f.write('id\tprice\tdate\tname\n1\t2.5\t2020-01-02\tx\n2\t\t2020-02-03\t\n3\t4\t\tz\n')
+    rows = csv.load_csv(fn, records=True)
+    assert rows[0] == {'id': '1', 'price': '2.5', 'date': '2020-01-02', 'name': 'x'}
+    assert rows[0].price == '2.5' and rows[1]['name'] == '' and type(rows[0]) is type(rows[2])
+    assert not hasattr(rows[0], '__dict__')
+
+    columns = csv.load_columns(fn, use_numpy=False)
+    assert columns['id'].typecode == 'q' and list(columns['id']) == [1, 2, 3]
+    assert columns['price'].typecode == 'd' and math.isnan(columns['price'][1])
+    assert columns['date'] == [datetime.date(2020, 1, 2), datetime.date(2020, 2, 3), None]
+    assert columns['name'] == ['x', None, 'z']
+    with pytest.raises(ValueError):
+        csv.load_columns(fn, sample=1, use_numpy=False, types={'name': int})
+
+    with open(fn, 'w', newline='') as f:
+        f.write('word\tx\nnan\t1\ninf\tInfinity\n')
+    columns = csv.load_columns(fn, use_numpy=False)  # not taken to be floats
+    assert columns['word'] == ['nan', 'inf'] and columns['x'] == ['1', 'Infinity']
+    columns = csv.load_columns(fn, use_numpy=False, types={'x': float})
+    assert list(columns['x']) == [1.0, math.inf]
+
+
+def test_parallel_csv(tmp_path):
+    fn = str(tmp_path / 'a.csv')
+    with open(fn, 'w', newline='') as f:
+        f.write('n,note\n')
+        for i in range(1000):
+            f.write('%d,"line\n""%d"""\n' % (i, i) if i % 3 == 0 else '%d,x%d\n' % (i, i))
+    ranges = csv.csv_ranges(fn, chunk_size=100)
+    assert len(ranges) > 10 and ranges[-1][1] == os.path.getsize(fn)
+    serial = csv.load_csv(fn, delimiter=',')
+    assert serial[3]['note'] == 'line\n"3"'
+    assert csv.load_csv(fn, delimiter=',', workers=2, chunk_size=100) == serial
+    rows = csv.load_csv(fn, delimiter=',', workers=2, chunk_size=100, ordered=False, records=True)
+    assert sorted(rows, key=lambda row: int(row.n)) == serial
+    assert len({row.__class__ for row in rows}) == 1  # one Record class for all the ranges
+
+
+def test_dump_csv(tmp_path):
+    import gzip, zipfile
+
+    rows = [{'a': '1', 'b': 'two\nlines'}, {'a': '3', 'b': None}]
+    for name in ['out.tsv', 'out.tsv.gz']:
+        fn = str(tmp_path / name)
+        assert csv.dump_csv(fn, iter(rows), buffer_size=4) == 2
+    assert csv.load_csv(str(tmp_path / 'out.tsv')) == [rows[0], {'a': '3', 'b': ''}]
+    with gzip.open(str(tmp_path / 'out.tsv.gz'), 'rb') as f:
+        assert f.read() == open(str(tmp_path / 'out.tsv'), 'rb').read()
+
+    records = csv.load_csv(str(tmp_path / 'out.tsv'), records=True)
+    csv.dump_csv(str(tmp_path / 'out.zip'), records, delimiter=',', headings=False)
+    with zipfile.ZipFile(str(tmp_path / 'out.zip')) as z:
+        assert z.read('out') == b'1,"two\nlines"\r\n3,\r\n'
+    with pytest.raises(ValueError):
+        csv.dump_csv(str(tmp_path / 'x.tsv'), [{'a': 1}], keys=['b'])
+
+    # lists without keys get excel_key() headings, so that they read back in full
+    csv.dump_csv(str(tmp_path / 'list.tsv'), [['1', '2'], ['3', '4']])
+    assert csv.load_csv(str(tmp_path / 'list.tsv')) == [{'A': '1', 'B': '2'}, {'A': '3', 'B': '4'}]
@@ -1,3 +1,67 @@
 import pytest
 from bl import dict
 
+
+
+def test_lazy_dict():
+    doc = {'a': {'b': [b'x', {'c': [b'y']}]}}
+    assert dict.LazyDict(**doc) == dict.Dict(**doc) and dict.Dict(**doc) == dict.LazyDict(**doc)
+    assert dict.LazyDict(**doc) != dict.Dict(a={'b': ['x', {'c': ['z']}]})  # before any reads
+    doc = {'a': {'b': [{'c': 1}, [b'x']]}, 'x': {'y': 0}}
+    d = dict.LazyDict(**doc)
+    assert type(d.a) == dict.LazyDict and d.a.b[0].c == 1 and d.a.b[1][0] == 'x'
+    assert d.a is d.a and d['a']['b'][0] is d.a.b[0]  # converted once, and kept
+    assert type(d.get('x')) == dict.LazyDict and d.missing is None
+    assert [type(v) for k, v in d.items()] == [dict.LazyDict, dict.LazyDict]
+    assert doc == {'a': {'b': [{'c': 1}, [b'x']]}, 'x': {'y': 0}}  # the original is unchanged
+    assert d == dict.Dict(**doc) and d.json() == dict.Dict(**doc).json()
+
+
+def test_sorted_keys():
+    import builtins, copy, pickle
+
+    d = dict.Dict(c=3, a=1)
+    assert d.keys() == ['a', 'c'] and d.values() == [1, 3]
+    d.b = 2
+    d['d'] = 4
+    del d['c']
+    assert d.pop('a') == 1 and d.setdefault('e', 5) == 5 and d.setdefault('e', 6) == 5
+    assert d.keys() == ['b', 'd', 'e'] and d.keys(reverse=True) == ['e', 'd', 'b']
+    assert d.sorted_keys() is d.sorted_keys()
+    d.keys().append('x')  # keys() returns a copy
+    assert repr(d) == "{'b': 2, 'd': 4, 'e': 5}"
+    builtins.dict.__setitem__(d, 'a', 0)  # around the cache: noticed by its length
+    assert d.keys() == ['a', 'b', 'd', 'e']
+    c = copy.copy(d)
+    c.f = 6
+    assert d.keys() == ['a', 'b', 'd', 'e'] and pickle.loads(pickle.dumps(c)).keys()[-1] == 'f'
+    d |= {'z': 0}
+    assert d.keys() == ['a', 'b', 'd', 'e', 'z']
+    d.clear()
+    assert d.keys() == []
+
+    # subclasses keep the cache in step, even when a key is removed and another added
+    d = dict.LazyDict(a=1, b={'x': 2})
+    assert d.keys() == ['a', 'b']
+    assert d.pop('a') == 1 and d.b.x == 2
+    d.update(c=3)
+    assert d.keys() == ['b', 'c'] and repr(d) == "{'b': {'x': 2}, 'c': 3}"
+
+
+def test_getter_pluck():
+    from bl.no import No, NoDict
+
+    assert dict.parse_path('a.b[0].c') == ('a', 'b', 0, 'c')
+    assert dict.parse_path('a["b.c"][-1]') == ('a', 'b.c', -1)
+    for path in ['a..b', 'a[x]', 'a.', 'a[0]b']:
+        with pytest.raises(ValueError):
+            dict.parse_path(path)
+    d = dict.Dict(a={'b': [{'c': 1}, 2]})
+    assert dict.getter('a.b[0].c')(d) == 1 and dict.getter('a.b[-1]')(d) == 2
+    assert dict.getter('a.b[5].c')(d) is None and dict.getter('a.b.c', default=0)(d) == 0
+    assert dict.getter('a.x.y')(NoDict(a=NoDict())) is No() and No().x[0] is No()
+    records = [dict.Dict(id=i, tags=['t%d' % i] * (i % 2)) for i in range(4)]
+    assert dict.pluck(records, 'id', 'tags[0]', default='') == [
+        [0, 1, 2, 3],
+        ['', 't1', '', 't3'],
+    ]
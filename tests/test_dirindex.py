@@ -0,0 +1,63 @@
+import os
+import pytest
+from bl import dirindex
+from bl.folder import Folder
+
+
+def make_tree(path, fns):
+    for fn in fns:
+        os.makedirs(os.path.dirname(os.path.join(path, fn)), exist_ok=True)
+        with open(os.path.join(path, fn), 'w') as f:
+            f.write(fn)
+
+
+def test_scan_and_rescan(tmp_path, monkeypatch):
+    root = str(tmp_path / 'root')
+    make_tree(root, ['a.txt', 'b/c.txt', 'b/d/e.py'])
+    index = dirindex.DirIndex(fn=str(tmp_path / 'root.index'), root=root)
+    changes = index.scan()
+    assert sorted(changes.added) == ['a.txt', 'b', 'b/c.txt', 'b/d', 'b/d/e.py']
+    index.write()
+
+    index = dirindex.DirIndex(fn=str(tmp_path / 'root.index'), root=root)
+    assert index.scan() == {'added': [], 'removed': [], 'modified': []}
+    os.remove(os.path.join(root, 'b/c.txt'))
+    with open(os.path.join(root, 'a.txt'), 'a') as f:
+        f.write('more')
+    make_tree(root, ['b/d/f.py'])
+    changes = index.scan()
+    assert changes == {'added': ['b/d/f.py'], 'removed': ['b/c.txt'], 'modified': ['a.txt']}
+
+    # symlinks are indexed, not followed (a link to an ancestor would loop)
+    os.symlink('..', os.path.join(root, 'b/up'))
+    assert index.scan().added == ['b/up'] and {e.name: e.type for e in index.dirs['b'][2]}['up'] == dirindex.FILE
+
+    # a directory that can't be listed keeps its entries, and the scan goes on
+    make_tree(root, ['b/d/g.py', 'h.txt'])
+
+    list_dir = dirindex.DirIndex.list
+
+    def list(dirpath, pruned=None):
+        if dirpath.endswith('d'):
+            raise PermissionError(dirpath)
+        return list_dir(dirpath, pruned=pruned)
+
+    monkeypatch.setattr(dirindex.DirIndex, 'list', staticmethod(list))
+    assert index.scan().added == ['h.txt']
+    assert sorted(e.name for e in index.dirs['b/d'][2]) == ['e.py', 'f.py']
+    monkeypatch.undo()
+    assert index.scan().added == ['b/d/g.py']
+
+
+def test_query_from_index(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, ['a.txt', 'b/c.txt', 'b/d/e.py', 'b/~f.py'])
+    index = dirindex.DirIndex(root=root)
+    index.scan()
+    assert index.rglob('*.txt') == [os.path.join(root, fn) for fn in ['a.txt', 'b/c.txt']]
+    assert index.rglob('*.py', path=os.path.join(root, 'b'), exclude=['~*']) == [
+        os.path.join(root, 'b/d/e.py')
+    ]
+    assert Folder(root).rglob('*', index=index) == Folder(root).rglob('*')
+    assert Folder(root).rglob('*', index=index, workers=4) == Folder(root).rglob('*', workers=4)
+    assert Folder(root).fileset(index=index, workers=4).pathset() == Folder(root).fileset().pathset()
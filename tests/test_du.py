@@ -0,0 +1,45 @@
+import os
+import pytest
+from bl import du
+from bl.dirindex import DirIndex
+from bl.file import File
+from bl.folder import Folder
+
+
+def make_file(fn, size):
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    with open(fn, 'wb') as f:
+        f.write(b'x' * size)
+
+
+def test_usage(tmp_path):
+    root = str(tmp_path)
+    make_file(os.path.join(root, 'a.bin'), 100)
+    make_file(os.path.join(root, 'b/c.bin'), 1000)
+    make_file(os.path.join(root, 'b/d/e.bin'), 5000)
+    os.link(os.path.join(root, 'a.bin'), os.path.join(root, 'f.bin'))  # counted once
+    os.symlink(os.path.join(root, 'b'), os.path.join(root, 'g'))  # not followed
+
+    total = du.disk_usage(root)
+    assert (total.apparent, total.files, total.dirs) == (6100 + len(os.path.join(root, 'b')), 4, 2)
+    assert total.allocated > 0
+    assert du.disk_usage(root, workers=4) == total
+    assert File(os.path.join(root, 'b')).size == 6000
+
+    report = Folder(root).usage(top=1, key='apparent')
+    assert [(t.path, t.apparent) for t in report.top] == [(os.path.join(root, 'b'), 6000)]
+
+    index = DirIndex(root=os.path.join(root, 'b'))
+    index.scan()
+    assert du.disk_usage(os.path.join(root, 'b'), index=index) == du.disk_usage(
+        os.path.join(root, 'b')
+    )
+
+    # symlinks in an index aren't followed either
+    h = os.path.join(root, 'h')
+    make_file(os.path.join(h, 'i.bin'), 10)
+    os.symlink(root, os.path.join(h, 'up'))
+    os.symlink(os.path.join(root, 'b/d/e.bin'), os.path.join(h, 'e.bin'))
+    index = DirIndex(root=h)
+    index.scan()
+    assert du.disk_usage(h, index=index) == du.disk_usage(h)
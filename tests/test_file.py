@@ -1,3 +1,181 @@
+import copy, os, pickle
 import pytest
 from bl import file
 
+
+def test_streaming_reads(tmp_path):
+    fn = str(tmp_path / 'a.txt')
+    with open(fn, 'wb') as f:
+        f.write(b'one\ntwo\nthree\n')
+    f = file.File(fn)
+    assert list(f.iter_chunks(size=5)) == [b'one\nt', b'wo\nth', b'ree\n']
+    assert list(f.iter_lines()) == [b'one\n', b'two\n', b'three\n']
+    assert list(f.iter_lines(mode='r')) == ['one\n', 'two\n', 'three\n']
+    with f.mmap() as data:
+        assert memoryview(data)[4:7] == b'two'
+    open(str(tmp_path / 'empty'), 'w').close()
+    with file.File(str(tmp_path / 'empty')).mmap() as data:
+        assert data == b''
+
+
+def test_copy_and_write_stream(tmp_path):
+    fn = str(tmp_path / 'a.bin')
+    with open(fn, 'wb') as f:
+        f.write(os.urandom(3 * 1024 * 1024 + 5))
+    f = file.File(fn)
+    g = f.copy(str(tmp_path / 'sub' / 'b.bin'))
+    assert g.read() == f.read() and g.mtime == f.mtime
+    f.write(fn=str(tmp_path / 'c.bin'))
+    assert file.File(str(tmp_path / 'c.bin')).read() == f.read()
+
+
+def test_hash(tmp_path):
+    import hashlib, base64
+    from bl.hashcache import HashCache
+
+    data = os.urandom(2 * file.File.CHUNK_SIZE + 3)
+    fns = []
+    for i in range(3):
+        fns.append(str(tmp_path / ('%d.bin' % i)))
+        with open(fns[-1], 'wb') as f:
+            f.write(data[i:])
+    expected = [hashlib.sha256(data[i:]).hexdigest() for i in range(3)]
+    assert file.File(fns[0]).hash(b64=False) == expected[0]
+    assert file.File(fns[0]).hash() == (
+        base64.urlsafe_b64encode(bytes.fromhex(expected[0])).decode().rstrip('=')
+    )
+    assert file.File.hash_many(fns, b64=False) == expected
+
+    cache = HashCache(fn=str(tmp_path / 'hashes.json'))
+    assert file.File.hash_many(fns, b64=False, cache=cache) == expected
+    cache.write()
+    cache = HashCache(fn=str(tmp_path / 'hashes.json'))
+    assert len(cache.data) == 3
+    with open(fns[0], 'wb') as f:
+        f.write(b'changed')
+    assert file.File(fns[0]).hash(b64=False, cache=cache) == hashlib.sha256(b'changed').hexdigest()
+    assert file.File(fns[1]).hash(b64=False, cache=cache) == expected[1]
+
+    # a listed file (with a stat snapshot) that changes before it is hashed
+    from bl.folder import Folder
+
+    listed = Folder(str(tmp_path)).rglob('2.bin')[0]
+    assert listed.size == len(data) - 2
+    with open(fns[2], 'wb') as f:
+        f.write(b'rewritten')
+    assert listed.hash(b64=False, cache=cache) == hashlib.sha256(b'rewritten').hexdigest()
+    assert cache.get(os.stat(fns[2]), 'sha256') == hashlib.sha256(b'rewritten').digest()
+    assert cache.get(listed.stat(), 'sha256') == bytes.fromhex(expected[2])  # not overwritten
+
+
+def test_copy_methods(tmp_path, monkeypatch):
+    fn = str(tmp_path / 'a.bin')
+    data = os.urandom(file.File.CHUNK_SIZE + 17)
+    with open(fn, 'wb') as f:
+        f.write(data)
+    f = file.File(fn)
+    assert f.copy(str(tmp_path / 'b.bin'), reflink=True).read() == data
+    for method in ['copy_file_range', 'sendfile']:  # fall back to the other methods
+        monkeypatch.delattr(os, method, raising=False)
+        assert f.copy(str(tmp_path / ('%s.bin' % method))).read() == data
+    new_files = file.File.copy_many([(fn, str(tmp_path / 'many' / ('%d.bin' % i))) for i in range(4)])
+    assert [g.read() == data and g.mtime == f.mtime for g in new_files] == [True] * 4
+
+
+def test_atomic_write(tmp_path, monkeypatch):
+    fn = str(tmp_path / 'a.txt')
+    file.File(fn).write(data=b'one')
+    os.chmod(fn, 0o640)
+    file.File(fn).write(data=b'two', atomic=True, fsync=True)
+    assert file.File(fn).read() == b'two'
+    assert os.stat(fn).st_mode & 0o777 == 0o640
+    assert os.listdir(str(tmp_path)) == ['a.txt']
+
+    def fail(*args):
+        raise OSError("disk error")
+
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        file.File(fn).write(data=b'three', atomic=True, max_tries=1)
+    assert file.File(fn).read() == b'two'
+    assert os.listdir(str(tmp_path)) == ['a.txt']
+
+
+def test_write_behind(tmp_path):
+    from bl.writebehind import WriteBehind
+    from bl.text import Text
+
+    with WriteBehind(atomic=True) as wb:
+        for i in range(50):
+            wb.write(file.File(str(tmp_path / ('%d.txt' % (i % 5)))), data=b'%d' % i)
+        wb.write(Text(str(tmp_path / 'log.txt')), text='a')
+        wb.write(Text(str(tmp_path / 'log.txt')), text='b', mode='ab', atomic=False)
+    assert wb.errors == []
+    assert [file.File(str(tmp_path / ('%d.txt' % i))).read() for i in range(5)] == [
+        b'45', b'46', b'47', b'48', b'49'
+    ]
+    assert file.File(str(tmp_path / 'log.txt')).read() == b'ab'
+
+
+def test_stat_snapshot(tmp_path, monkeypatch):
+    from bl.folder import Folder
+
+    os.makedirs(str(tmp_path / 'sub'))
+    with open(str(tmp_path / 'sub' / 'a.txt'), 'wb') as f:
+        f.write(b'abc')
+    saved = file.File.stat_calls_saved
+    files = Folder(str(tmp_path)).rglob('*', dirs=True)
+    assert [f.__class__.__name__ for f in files] == ['Folder', 'File']
+    assert files[0].isdir and files[1].isfile and files[1].size == 3
+    assert file.File.stat_calls_saved > saved
+    for f in [pickle.loads(pickle.dumps(files[1])), copy.deepcopy(files[1])]:
+        assert f == files[1] and f.stat_snapshot() is None and f.size == 3
+
+    # the snapshot is used until it is refreshed
+    f = files[1]
+    with open(f.fn, 'ab') as g:
+        g.write(b'def')
+    assert f.size == 3 and f.refresh().size == 6
+    os.remove(f.fn)
+    assert f.exists and not f.refresh().exists
+
+    # or until it expires
+    g = file.File(str(tmp_path / 'sub')).refresh()
+    os.rmdir(g.fn)
+    assert g.isdir
+    monkeypatch.setattr(file.File, 'STAT_TTL', 0)
+    assert not g.isdir
+    assert [f.basename for f in Folder(str(tmp_path)).glob('*')] == []
+
+
+def test_file_list_symlinks(tmp_path):
+    os.makedirs(str(tmp_path / 'dir'))
+    with open(str(tmp_path / 'dir' / 'a.txt'), 'wb') as f:
+        f.write(b'a')
+    os.symlink('..', str(tmp_path / 'dir' / 'up'))  # would loop if followed
+    fl = file.File(str(tmp_path)).file_list()
+    assert sorted(os.path.relpath(f.fn, str(tmp_path)) for f in fl) == ['dir', 'dir/a.txt']
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason="needs procfs")
+def test_mmap_pseudo_file():
+    from bl.text import Text
+
+    with file.File('/proc/self/status').mmap() as data:
+        assert data.startswith(b'Name:')
+    assert Text('/proc/self/status').text.startswith('Name:')
+
+
+def test_text_json_not_mapped(tmp_path, monkeypatch):
+    # a mapped file that another process truncates raises SIGBUS, so these read instead
+    from bl.json import JSON
+    from bl.text import Text
+
+    def no_mmap(self, write=False):
+        raise AssertionError("mapped")
+
+    monkeypatch.setattr(file.File, 'mmap', no_mmap)
+    with open(str(tmp_path / 'a.json'), 'w', encoding='utf-8') as f:
+        f.write('{"a": "é"}')
+    assert JSON(str(tmp_path / 'a.json')).data == {'a': 'é'}
+    assert Text(str(tmp_path / 'a.json'), encoding='UTF-8').text == '{"a": "é"}'
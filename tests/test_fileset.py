@@ -0,0 +1,29 @@
+import os, time
+import pytest
+from bl.fileset import FileSet
+from bl.folder import Folder
+
+
+def test_fileset(tmp_path):
+    os.makedirs(str(tmp_path / 'sub'))
+    for fn, size in [('a.txt', 3), ('b.JPG', 10), ('sub/c.jpg', 5)]:
+        with open(str(tmp_path / fn), 'wb') as f:
+            f.write(b'x' * size)
+    files = Folder(str(tmp_path)).fileset(dirs=True)
+    assert len(files) == 4 and str(tmp_path / 'sub' / 'c.jpg') in files
+    assert files.filter(type='d')[0].__class__.__name__ == 'Folder'
+
+    jpgs = files.filter(ext='.jpg')
+    assert [f.basename for f in jpgs.sort('size', reverse=True)] == ['b.JPG', 'c.jpg']
+    assert jpgs.table is files.table and jpgs.total_size() == 15
+    assert [f.basename for f in files.filter(type='f', max_size=5).sort('name')] == [
+        'a.txt', 'c.jpg'
+    ]
+    assert len(files.filter(since=time.time() - 60, regex=r'^[ab]\.')) == 2
+    assert len(files.filter(before=time.time() - 60)) == 0
+
+    others = FileSet([str(tmp_path / 'a.txt'), str(tmp_path / 'd.txt')])
+    assert sorted(os.path.basename(p) for p in (files & others).paths()) == ['a.txt']
+    assert len(files - others) == 3
+    union = files | others
+    assert len(union) == 5 and union.filter(regex='^d').sizes() == [-1]
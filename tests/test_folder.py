@@ -1,3 +1,70 @@
 import pytest
 from bl import folder
 
+
+
+def test_sync(tmp_path):
+    import os
+
+    src, dest = tmp_path / 'src', tmp_path / 'dest'
+    os.makedirs(str(src / 'sub' / 'empty'))
+    for fn, data in [('a.txt', b'aaa'), ('sub/b.txt', b'bb')]:
+        with open(str(src / fn), 'wb') as f:
+            f.write(data)
+    report = folder.Folder(str(src)).sync(str(dest))
+    assert (report.copied.files, report.copied.bytes, report.dirs) == (2, 5, 2)
+    assert open(str(dest / 'sub' / 'b.txt'), 'rb').read() == b'bb'
+    assert os.path.isdir(str(dest / 'sub' / 'empty'))
+
+    # unchanged files are skipped; extras are deleted only with delete=True
+    os.makedirs(str(dest / 'extra'))
+    with open(str(dest / 'extra' / 'c.txt'), 'wb') as f:
+        f.write(b'cccc')
+    with open(str(src / 'a.txt'), 'wb') as f:
+        f.write(b'aaaa')
+    report = folder.Folder(str(src)).sync(str(dest), dry_run=True, delete=True)
+    assert (report.copied.files, report.skipped.files, report.deleted.bytes) == (1, 1, 4)
+    assert open(str(dest / 'a.txt'), 'rb').read() == b'aaa'
+    report = folder.Folder(str(src)).sync(str(dest), delete=True)
+    assert (report.copied.files, report.deleted.files, report.errors) == (1, 1, [])
+    assert open(str(dest / 'a.txt'), 'rb').read() == b'aaaa'
+    assert not os.path.exists(str(dest / 'extra'))
+
+    # with hash=True, files with the same size and mtime are compared
+    with open(str(dest / 'a.txt'), 'wb') as f:
+        f.write(b'xxxx')
+    st = os.stat(str(src / 'a.txt'))
+    os.utime(str(dest / 'a.txt'), ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert folder.Folder(str(src)).sync(str(dest)).copied.files == 0
+    assert folder.Folder(str(src)).sync(str(dest), hash=True).copied.files == 1
+    assert open(str(dest / 'a.txt'), 'rb').read() == b'aaaa'
+
+    # a symlink in dest is replaced, not written through
+    with open(str(tmp_path / 'outside.txt'), 'wb') as f:
+        f.write(b'outside')
+    os.remove(str(dest / 'sub' / 'b.txt'))
+    os.symlink(str(tmp_path / 'outside.txt'), str(dest / 'sub' / 'b.txt'))
+    assert folder.Folder(str(src)).sync(str(dest)).copied.files == 1
+    assert open(str(tmp_path / 'outside.txt'), 'rb').read() == b'outside'
+    assert not os.path.islink(str(dest / 'sub' / 'b.txt'))
+    assert open(str(dest / 'sub' / 'b.txt'), 'rb').read() == b'bb'
+
+
+def test_duplicates(tmp_path):
+    import os
+
+    big = os.urandom(300 * 1024)
+    i = 150 * 1024
+    changed = big[:i] + bytes([(big[i] + 1) % 256]) + big[i + 1 :]  # same head, tail, and size
+    os.makedirs(str(tmp_path / 'sub'))
+    for fn, data in [
+        ('a.bin', big), ('sub/b.bin', big), ('c.bin', changed), ('d.txt', b'abc'),
+        ('sub/e.txt', b'abc'), ('f.txt', b'abd'), ('g.txt', b''), ('h.txt', b''),
+    ]:
+        with open(str(tmp_path / fn), 'wb') as f:
+            f.write(data)
+    os.link(str(tmp_path / 'a.bin'), str(tmp_path / 'link.bin'))
+    groups = folder.Folder(str(tmp_path)).duplicates(sample_size=1024)
+    names = [[os.path.relpath(f.fn, str(tmp_path)) for f in group] for group in groups]
+    assert names[0][0] in ['a.bin', 'link.bin']  # one of the hard links
+    assert names[0][1:] == ['sub/b.bin'] and names[1:] == [['d.txt', 'sub/e.txt']]
@@ -1,3 +1,41 @@
 import pytest
 from bl import json
 
+
+def test_write_indent(tmp_path):
+    fn = str(tmp_path / 'a.json')
+    json.JSON(fn=fn, data={'a': [1, 2]}).write(indent=None)
+    assert open(fn).read() == '{"a": [1, 2]}'
+    json.JSON(fn=fn, data={'a': [1, 2]}).write(compact=True)
+    assert open(fn).read() == '{"a":[1,2]}'
+    assert json.JSON(fn=fn).data == {'a': [1, 2]}
+
+
+def test_iter_array(tmp_path):
+    fn = str(tmp_path / 'a.json')
+    items = [123456, 'a, "b"]', {'c': [1, {}]}, None, -1.5e10, [], 'x' * 20]
+    with open(fn, 'w') as f:
+        f.write(' [\n' + ',\n '.join(__import__('json').dumps(i) for i in items) + '\n] ')
+    for size in [1, 3, 1000]:
+        assert list(json.JSON.iter_array(fn, size=size)) == items
+    for text in ['[1, 2', '[1,,2]', '[,1]', '[1,]', '[1 2]', '[]]', '']:
+        with open(fn, 'w') as f:
+            f.write(text)
+        for size in [1, 2, 1000]:
+            with pytest.raises(ValueError):
+                list(json.JSON.iter_array(fn, size=size))
+    with open(fn, 'w') as f:
+        f.write(' [ ] ')
+    assert list(json.JSON.iter_array(fn, size=1)) == []
+
+
+def test_json_lines(tmp_path):
+    fn = str(tmp_path / 'log' / 'events.jsonl')
+    events = json.JSONLines(fn=fn)
+    events.append({'n': 1})
+    events.extend({'n': n} for n in range(2, 5))
+    assert list(events.records()) == [{'n': n} for n in range(1, 5)] and events.count() == 4
+    events.write(records=(r for r in events.records() if r['n'] % 2 == 0))
+    assert open(fn).read() == '{"n":2}\n{"n":4}\n'
+    events.write(fn=str(tmp_path / 'copy.jsonl'))
+    assert json.JSONLines(fn=str(tmp_path / 'copy.jsonl')).count() == 2
@@ -0,0 +1,51 @@
+import copy, pickle, random
+import pytest
+from bl.dict import Dict
+from bl.pmap import PMap, PNoDict
+
+
+class Collider(str):
+    """a key whose hash collides with the others"""
+
+    def __hash__(self):
+        return 42
+
+    __eq__ = str.__eq__
+
+
+def test_pmap_like_dict():
+    random.seed(1)
+    model, m, versions = {}, PMap(), []
+    for i in range(3000):
+        key = random.choice(['k%d' % random.randrange(500), Collider('c%d' % random.randrange(5))])
+        if key in model and random.random() < 0.4:
+            del model[key]
+            m = m.delete(key)
+        else:
+            model[key] = i
+            m = m.set(key, i)
+        if i % 500 == 0:
+            versions.append((dict(model), m))
+    for expected, version in versions + [(model, m)]:  # earlier versions are unchanged
+        assert len(version) == len(expected) and dict(version.items()) == expected
+    with pytest.raises(KeyError):
+        PMap(a=1).delete('b')
+
+
+def test_pmap_api():
+    base = PMap(db={'host': 'localhost', 'port': 5432}, tags=['a', {'b': 1}], debug=False)
+    derived = base(debug=True)
+    assert base.debug is False and derived.debug is True and derived.db is base.db
+    assert derived.db.port == 5432 and derived.tags[1].b == 1 and derived.missing is None
+    assert derived.keys() == ['db', 'debug', 'tags'] and len(derived) == 3
+    assert derived.to_dict() == Dict(
+        db=Dict(host='localhost', port=5432), debug=True, tags=['a', Dict(b=1)]
+    )
+    assert PMap(**derived.to_dict()) == derived and hash(PMap(a=1)) == hash(PMap(a=1))
+    assert pickle.loads(pickle.dumps(derived)) == derived == copy.deepcopy(derived)
+    assert derived.json(sort_keys=True).startswith('{"db": {"host"')
+    with pytest.raises(TypeError):
+        derived.debug = False
+    n = PNoDict(a={'b': 1})
+    assert n.a.b == 1 and not n.x.y.z and n['x'] is not None and repr(n.z) == 'No'
+    assert type(n.a) == PNoDict and n.to_dict().a.c.__class__.__name__ == 'No'
@@ -0,0 +1,30 @@
+import copy, pickle
+import pytest
+from bl.dict import Dict
+from bl.record import record_type
+
+Point = record_type('Point', 'y x label')
+
+
+def test_record():
+    p = Point(2, x=1)
+    assert (p.x, p.y, p.label, p['x']) == (1, 2, None, 1) and not hasattr(p, '__dict__')
+    with pytest.raises(KeyError):
+        p['label']
+    assert p.keys() == ['x', 'y'] and p.values() == [1, 2] and 'label' not in p
+    q = p(label='origin')
+    assert p.label is None and q.label == 'origin' and q.get('label') == 'origin'
+    assert q.to_dict() == Dict(label='origin', x=1, y=2) and type(q.to_dict()) == Dict
+    assert Point.from_dict(p.to_dict()) == p == {'x': 1, 'y': 2} and p != q
+    assert q.json(sort_keys=True) == '{"label": "origin", "x": 1, "y": 2}'
+    assert pickle.loads(pickle.dumps(q)) == q == copy.deepcopy(q)
+    assert repr(p) == 'Point(x=1, y=2)'
+    p.label = 'moved'
+    del p['y']
+    assert p.keys() == ['label', 'x'] and p.y is None
+    with pytest.raises(AttributeError):
+        p.z = 1
+    with pytest.raises(KeyError):
+        Point(z=1)
+    with pytest.raises(ValueError):
+        record_type('Bad', 'a keys')
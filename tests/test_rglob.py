@@ -1,3 +1,61 @@
+import os, re
 import pytest
 from bl import rglob
 
+
+def make_tree(path, fns):
+    for fn in fns:
+        os.makedirs(os.path.dirname(os.path.join(path, fn)), exist_ok=True)
+        open(os.path.join(path, fn), 'w').close()
+
+
+def test_rglob_matches_glob_semantics(tmp_path):
+    make_tree(str(tmp_path), ['a.txt', 'b/c.txt', 'b/d.py', 'b/.e.txt', 'f/sub/g.txt'])
+    path = str(tmp_path)
+    assert rglob.rglob(path, '*.txt') == [
+        os.path.join(path, fn) for fn in ['a.txt', 'b/c.txt', 'f/sub/g.txt']
+    ]
+    assert rglob.rglob(path, '.*') == [os.path.join(path, 'b/.e.txt')]
+    assert rglob.rglob(path, 'sub/*.txt') == [os.path.join(path, 'f/sub/g.txt')]
+
+
+def test_irglob_is_lazy(tmp_path):
+    make_tree(str(tmp_path), ['a.txt', 'b/c.txt'])
+    results = rglob.irglob(str(tmp_path), '*.txt')
+    assert next(results).endswith('.txt')
+    assert len(list(results)) == 1
+
+
+def test_rglob_dirs(tmp_path):
+    make_tree(str(tmp_path), ['a/b/c.txt'])
+    path = str(tmp_path)
+    assert rglob.rglob(path, '*.py', dirs=True) == [
+        os.path.join(path, 'a'),
+        os.path.join(path, 'a/b'),
+    ]
+
+
+def test_rglob_many_single_pass(tmp_path):
+    make_tree(
+        str(tmp_path),
+        ['a.txt', 'b.py', '~c.txt', '.git/d.txt', 'node_modules/e.py', 'f/g.txt', 'f/~h.py'],
+    )
+    path = str(tmp_path)
+    regex = re.compile(r'^[ab]\.')
+    results = rglob.rglob_many(
+        path, ['*.txt', '*.py', regex], exclude=['~*'], prune=rglob.SKIP_DIRS
+    )
+    assert list(results.keys()) == ['*.txt', '*.py', regex]
+    assert results['*.txt'] == [os.path.join(path, fn) for fn in ['a.txt', 'f/g.txt']]
+    assert results['*.py'] == [os.path.join(path, 'b.py')]
+    assert results[regex] == [os.path.join(path, fn) for fn in ['a.txt', 'b.py']]
+
+
+def test_parallel_walk(tmp_path):
+    make_tree(str(tmp_path), ['%d/%d/f%d.txt' % (i, j, k) for i in range(4) for j in range(3) for k in range(2)])
+    path = str(tmp_path)
+    assert rglob.rglob(path, '*.txt', workers=4) == rglob.rglob(path, '*.txt')
+    ordered = [entry.path for entry in rglob.walk(path, workers=4, ordered=True)]
+    assert ordered == [entry.path for entry in rglob.walk(path, workers=2, ordered=True)]
+    assert ordered[:4] == [os.path.join(path, str(i)) for i in range(4)]
+    assert len(list(rglob.walk(path, workers=4, depth=2))) == 4 + 12
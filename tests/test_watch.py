@@ -0,0 +1,39 @@
+import copy, os, pickle, sys, time
+import pytest
+from bl.folder import Folder
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify is Linux-only")
+
+
+def wait_for(condition, timeout=5):
+    t = time.time()
+    while not condition() and time.time() - t < timeout:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_watched_folder(tmp_path):
+    root = str(tmp_path)
+    os.makedirs(os.path.join(root, 'a'))
+    open(os.path.join(root, 'a', 'b.txt'), 'w').close()
+    folder = Folder(root)
+    folder.watch()
+    try:
+        assert [f.fn for f in folder.rglob('*.txt')] == [os.path.join(root, 'a/b.txt')]
+        os.makedirs(os.path.join(root, 'c/d'))
+        open(os.path.join(root, 'c/d/e.txt'), 'w').close()
+        os.remove(os.path.join(root, 'a', 'b.txt'))
+        assert wait_for(
+            lambda: [f.fn for f in folder.rglob('*.txt')] == [os.path.join(root, 'c/d/e.txt')]
+        )
+        os.rename(os.path.join(root, 'c/d'), os.path.join(root, 'a/d'))
+        assert wait_for(
+            lambda: [f.fn for f in folder.rglob('*.txt')] == [os.path.join(root, 'a/d/e.txt')]
+        )
+        assert [f.fn for f in folder.glob('*/d')] == [os.path.join(root, 'a/d')]
+        assert len(folder.file_list()) == 4
+        for f in [copy.deepcopy(folder), pickle.loads(pickle.dumps(folder))]:
+            assert f == folder and f.__dict__.get('__index__') is None
+        assert len(folder.file_list(exclude=['*.txt'])) == 3 and len(folder.file_list(prune=['d'])) == 2
+    finally:
+        folder.unwatch()